@@ -1,121 +1,241 @@
 import json
 import os
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 
-def generate_ai_feedback(content: str, difficulty: str = 'N5') -> Dict[str, Any]:
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; batches fall back to the per-text analyzer
+    np = None
+
+from services.profiling import span
+
+DIFFICULTY_MULTIPLIERS = {
+    'N5': 1.0,
+    'N4': 1.1,
+    'N3': 1.2,
+    'N2': 1.3,
+    'N1': 1.4
+}
+
+HIRAGANA = (0x3040, 0x309f)
+KATAKANA = (0x30a0, 0x30ff)
+KANJI = (0x4e00, 0x9fff)
+SENTENCE_END = '。'
+
+# One str.translate pass maps every classified character to a private-use
+# marker; the markers are then counted in C. Marker characters already in the
+# input are remapped so they cannot be miscounted.
+_MARK_HIRAGANA = '\ue000'
+_MARK_KATAKANA = '\ue001'
+_MARK_KANJI = '\ue002'
+_MARK_SENTENCE = '\ue003'
+
+def _build_class_table() -> Dict[int, str]:
+    table = dict.fromkeys(range(0xe000, 0xe004), '\ue004')
+    for (start, end), mark in ((HIRAGANA, _MARK_HIRAGANA), (KATAKANA, _MARK_KATAKANA), (KANJI, _MARK_KANJI)):
+        table.update(dict.fromkeys(range(start, end + 1), mark))
+    table[ord(SENTENCE_END)] = _MARK_SENTENCE
+    return table
+
+_CLASS_TABLE = _build_class_table()
+
+ACTION_PLAN = (
+    "Practice writing complete sentences in Japanese",
+    "Learn more vocabulary related to your topic",
+    "Review grammar patterns for better structure",
+    "Read example writings to understand different styles"
+)
+
+PRACTICE_EXERCISES = (
+    {
+        "title": "Sentence Building",
+        "description": "Create 5 complete sentences using the vocabulary from this lesson",
+        "example": "私は学生です。日本語を勉強します。"
+    },
+    {
+        "title": "Vocabulary Expansion",
+        "description": "Find 10 new words related to your writing topic",
+        "example": "学校 (school), 先生 (teacher), 本 (book)"
+    }
+)
+
+DETAILED_ANALYSIS = {
+    "grammar": {
+        "score": 75,
+        "issues": ["Some particles missing", "Verb conjugation could be improved"],
+        "suggestions": ["Review particle usage (は、が、を)", "Practice verb forms"]
+    },
+    "vocabulary": {
+        "score": 80,
+        "strengths": ["Good basic vocabulary usage"],
+        "improvements": ["Use more advanced expressions", "Incorporate topic-specific terms"]
+    },
+    "structure": {
+        "score": 70,
+        "comments": "Good paragraph structure but could use better transitions"
+    },
+    "fluency": {
+        "score": 65,
+        "feedback": "Writing flows well but could be more natural"
+    },
+    "content": {
+        "score": 85,
+        "feedback": "Content is relevant and well-developed"
+    }
+}
+
+FAILED_FEEDBACK = {
+    "feedback_text": "Unable to generate detailed feedback at this time.",
+    "overall_score": 0,
+    "grade": "N/A",
+    "action_plan": ["Please try submitting again"],
+    "practice_exercises": [],
+    "detailed_analysis": {}
+}
+
+def analyze_text(content: str) -> Dict[str, int]:
+    """
+    Classify the characters of a text in a single scan.
+    Returns the stripped length, hiragana/katakana/kanji counts and the
+    number of sentence terminators (。).
+    """
+    classified = content.translate(_CLASS_TABLE)
+    return {
+        'length': len(content.strip()),
+        'hiragana': classified.count(_MARK_HIRAGANA),
+        'katakana': classified.count(_MARK_KATAKANA),
+        'kanji': classified.count(_MARK_KANJI),
+        'sentence_ends': classified.count(_MARK_SENTENCE),
+    }
+
+def analyze_texts(contents: List[str]) -> List[Dict[str, int]]:
+    """
+    analyze_text for many texts at once.
+    With numpy, all texts are concatenated into one code point array and
+    classified with vectorized range checks.
+    """
+    if np is None or not contents:
+        return [analyze_text(content) for content in contents]
+
+    codes = np.frombuffer(''.join(contents).encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+    bounds = np.zeros(len(contents) + 1, dtype=np.int64)
+    np.cumsum([len(content) for content in contents], out=bounds[1:])
+
+    def per_text(mask):
+        running = np.zeros(len(mask) + 1, dtype=np.int64)
+        np.cumsum(mask, out=running[1:])
+        return (running[bounds[1:]] - running[bounds[:-1]]).tolist()
+
+    counts = {
+        name: per_text((codes >= start) & (codes <= end))
+        for name, (start, end) in (('hiragana', HIRAGANA), ('katakana', KATAKANA), ('kanji', KANJI))
+    }
+    counts['sentence_ends'] = per_text(codes == ord(SENTENCE_END))
+
+    return [
+        {
+            'length': len(content.strip()),
+            'hiragana': counts['hiragana'][i],
+            'katakana': counts['katakana'][i],
+            'kanji': counts['kanji'][i],
+            'sentence_ends': counts['sentence_ends'][i],
+        }
+        for i, content in enumerate(contents)
+    ]
+
+def generate_ai_feedback(content: str, difficulty: str = 'N5', fallback: bool = True) -> Dict[str, Any]:
     """
     Generate AI feedback for student writing
     This is a simplified version - in production, this would use LangChain agents
+    Returns the failed-feedback placeholder on errors, or raises with
+    fallback=False so the caller can retry.
     """
     try:
-        # Basic scoring based on content length and difficulty
-        content_length = len(content.strip())
-
-        # Base score calculation
-        base_score = min(100, max(0, content_length * 2))  # Rough heuristic
-
-        # Adjust based on difficulty
-        difficulty_multiplier = {
-            'N5': 1.0,
-            'N4': 1.1,
-            'N3': 1.2,
-            'N2': 1.3,
-            'N1': 1.4
-        }.get(difficulty, 1.0)
-
-        overall_score = min(100, base_score * difficulty_multiplier)
-
-        # Generate basic feedback
-        feedback_text = f"Your writing shows good effort. "
-
-        if content_length < 50:
-            feedback_text += "Try to write more content to better express your ideas. "
-            overall_score *= 0.8
-        elif content_length > 200:
-            feedback_text += "Good length! Your writing is detailed. "
-        else:
-            feedback_text += "Good balance of content length. "
+        with span('generate_ai_feedback'):
+            with span('analyze_text'):
+                analysis = analyze_text(content)
+            with span('score'):
+                return _feedback_from_analysis(analysis, difficulty)
+    except Exception as e:
+        if not fallback:
+            raise
+        print(f"Error generating AI feedback: {e}")
+        return _failed_feedback()
 
-        # Basic grammar check (simplified)
-        sentences = content.split('。')
-        if len(sentences) > 1:
-            feedback_text += "You used proper sentence structure. "
-        else:
-            feedback_text += "Try using more complete sentences. "
-            overall_score *= 0.9
+def generate_ai_feedback_batch(items: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """
+    Score many (content, difficulty) pairs together.
+    Each result is identical to generate_ai_feedback(content, difficulty).
+    """
+    valid = [i for i, (content, _) in enumerate(items) if isinstance(content, str)]
+    try:
+        analyses = dict(zip(valid, analyze_texts([items[i][0] for i in valid])))
+    except Exception as e:
+        print(f"Batch analysis failed, scoring one by one: {e}")
+        return [generate_ai_feedback(content, difficulty) for content, difficulty in items]
 
-        # Vocabulary assessment (simplified)
-        japanese_chars = sum(1 for char in content if '\u3040' <= char <= '\u309f' or '\u30a0' <= char <= '\u30ff' or '\u4e00' <= char <= '\u9fff')
-        if japanese_chars > 10:
-            feedback_text += "Good use of Japanese characters. "
+    results = []
+    for i, (content, difficulty) in enumerate(items):
+        if i in analyses:
+            try:
+                results.append(_feedback_from_analysis(analyses[i], difficulty))
+                continue
+            except Exception as e:
+                print(f"Error generating AI feedback: {e}")
         else:
-            feedback_text += "Try incorporating more Japanese vocabulary. "
-            overall_score *= 0.85
-
-        # Generate action plan
-        action_plan = [
-            "Practice writing complete sentences in Japanese",
-            "Learn more vocabulary related to your topic",
-            "Review grammar patterns for better structure",
-            "Read example writings to understand different styles"
-        ]
-
-        # Generate practice exercises
-        practice_exercises = [
-            {
-                "title": "Sentence Building",
-                "description": "Create 5 complete sentences using the vocabulary from this lesson",
-                "example": "私は学生です。日本語を勉強します。"
-            },
-            {
-                "title": "Vocabulary Expansion",
-                "description": "Find 10 new words related to your writing topic",
-                "example": "学校 (school), 先生 (teacher), 本 (book)"
-            }
-        ]
-
-        # Detailed analysis
-        detailed_analysis = {
-            "grammar": {
-                "score": 75,
-                "issues": ["Some particles missing", "Verb conjugation could be improved"],
-                "suggestions": ["Review particle usage (は、が、を)", "Practice verb forms"]
-            },
-            "vocabulary": {
-                "score": 80,
-                "strengths": ["Good basic vocabulary usage"],
-                "improvements": ["Use more advanced expressions", "Incorporate topic-specific terms"]
-            },
-            "structure": {
-                "score": 70,
-                "comments": "Good paragraph structure but could use better transitions"
-            },
-            "fluency": {
-                "score": 65,
-                "feedback": "Writing flows well but could be more natural"
-            },
-            "content": {
-                "score": 85,
-                "feedback": "Content is relevant and well-developed"
-            }
-        }
+            print(f"Error generating AI feedback: content must be a string, got {type(content).__name__}")
+        results.append(_failed_feedback())
+    return results
 
-        return {
-            "feedback_text": feedback_text,
-            "overall_score": round(overall_score, 1),
-            "grade": "B" if overall_score >= 80 else "C" if overall_score >= 60 else "D",
-            "action_plan": action_plan,
-            "practice_exercises": practice_exercises,
-            "detailed_analysis": detailed_analysis
-        }
+def _feedback_from_analysis(analysis: Dict[str, int], difficulty: str) -> Dict[str, Any]:
+    # Basic scoring based on content length and difficulty
+    content_length = analysis['length']
 
-    except Exception as e:
-        print(f"Error generating AI feedback: {e}")
-        return {
-            "feedback_text": "Unable to generate detailed feedback at this time.",
-            "overall_score": 0,
-            "grade": "N/A",
-            "action_plan": ["Please try submitting again"],
-            "practice_exercises": [],
-            "detailed_analysis": {}
+    # Base score calculation
+    base_score = min(100, max(0, content_length * 2))  # Rough heuristic
+
+    # Adjust based on difficulty
+    difficulty_multiplier = DIFFICULTY_MULTIPLIERS.get(difficulty, 1.0)
+
+    overall_score = min(100, base_score * difficulty_multiplier)
+
+    # Generate basic feedback
+    feedback_text = "Your writing shows good effort. "
+
+    if content_length < 50:
+        feedback_text += "Try to write more content to better express your ideas. "
+        overall_score *= 0.8
+    elif content_length > 200:
+        feedback_text += "Good length! Your writing is detailed. "
+    else:
+        feedback_text += "Good balance of content length. "
+
+    # Basic grammar check (simplified): splitting on 。 yields more than one part
+    if analysis['sentence_ends'] > 0:
+        feedback_text += "You used proper sentence structure. "
+    else:
+        feedback_text += "Try using more complete sentences. "
+        overall_score *= 0.9
+
+    # Vocabulary assessment (simplified)
+    japanese_chars = analysis['hiragana'] + analysis['katakana'] + analysis['kanji']
+    if japanese_chars > 10:
+        feedback_text += "Good use of Japanese characters. "
+    else:
+        feedback_text += "Try incorporating more Japanese vocabulary. "
+        overall_score *= 0.85
+
+    return {
+        "feedback_text": feedback_text,
+        "overall_score": round(overall_score, 1),
+        "grade": "B" if overall_score >= 80 else "C" if overall_score >= 60 else "D",
+        "action_plan": list(ACTION_PLAN),
+        "practice_exercises": [dict(exercise) for exercise in PRACTICE_EXERCISES],
+        "detailed_analysis": {
+            section: {key: list(value) if isinstance(value, list) else value for key, value in fields.items()}
+            for section, fields in DETAILED_ANALYSIS.items()
         }
+    }
+
+def _failed_feedback() -> Dict[str, Any]:
+    return {**FAILED_FEEDBACK, "action_plan": list(FAILED_FEEDBACK["action_plan"]), "practice_exercises": []}
@@ -1,4 +1,6 @@
 from flask import Blueprint, jsonify
+from ..grading_worker import grading_queue
+from .response_cache import response_cache
 
 main_bp = Blueprint('main', __name__)
 
@@ -15,3 +17,13 @@ def home():
             'health': '/api/health'
         }
     }), 200
+
+@main_bp.route('/grading-queue', methods=['GET'])
+def grading_queue_status():
+    """Backlog and outcome counters of the background AI grading pool"""
+    return jsonify(grading_queue.stats()), 200
+
+@main_bp.route('/response-cache', methods=['GET'])
+def response_cache_status():
+    """Hit, miss and 304 counters of the per-student response cache"""
+    return jsonify(response_cache.stats()), 200
@@ -0,0 +1,100 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from flask import current_app, request
+
+from .serializers import dumps
+
+
+class StudentResponseCache:
+    """
+    Serialized JSON responses per student, keyed by request path and ETag.
+    Entries are only reused while the ETag (derived from the rows behind the
+    response) still matches, and are dropped when the student writes.
+    """
+
+    def __init__(self, max_students: Optional[int] = None, max_entries_per_student: Optional[int] = None):
+        self.max_students = max_students or int(os.getenv('STUDENT_CACHE_MAX_STUDENTS', 1000))
+        self.max_entries_per_student = max_entries_per_student or int(os.getenv('STUDENT_CACHE_MAX_ENTRIES', 16))
+        self._lock = threading.Lock()
+        self._students: 'OrderedDict[Any, OrderedDict]' = OrderedDict()
+        self._stats = {'hits': 0, 'misses': 0, 'notModified': 0, 'invalidations': 0}
+
+    def get(self, student_id, key: str, etag: str) -> Optional[bytes]:
+        with self._lock:
+            entries = self._students.get(student_id)
+            entry = entries.get(key) if entries is not None else None
+            if entry is None or entry[0] != etag:
+                self._stats['misses'] += 1
+                return None
+            self._students.move_to_end(student_id)
+            entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[1]
+
+    def put(self, student_id, key: str, etag: str, body: bytes) -> None:
+        with self._lock:
+            entries = self._students.get(student_id)
+            if entries is None:
+                entries = self._students[student_id] = OrderedDict()
+                while len(self._students) > self.max_students:
+                    self._students.popitem(last=False)
+            entries[key] = (etag, body)
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries_per_student:
+                entries.popitem(last=False)
+
+    def invalidate(self, student_id) -> None:
+        with self._lock:
+            if self._students.pop(student_id, None) is not None:
+                self._stats['invalidations'] += 1
+
+    def count_not_modified(self) -> None:
+        with self._lock:
+            self._stats['notModified'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'students': len(self._students)}
+
+
+response_cache = StudentResponseCache()
+
+
+def conditional_json(student_id, fingerprint: str, last_modified: Optional[datetime],
+                     build: Callable[[], Dict[str, Any]]):
+    """
+    Serve a student's JSON response with ETag / Last-Modified validation.
+    `fingerprint` must change whenever the response would change; `build` is
+    only called when neither the client nor the cache has a current copy.
+    """
+    key = request.full_path
+    etag = hashlib.sha1(f"{key}|{fingerprint}".encode('utf-8')).hexdigest()
+
+    not_modified = False
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    elif last_modified is not None and request.if_modified_since is not None:
+        # HTTP dates have one-second resolution
+        not_modified = last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+
+    if not_modified:
+        response_cache.count_not_modified()
+        response = current_app.response_class(status=304)
+    else:
+        body = response_cache.get(student_id, key, etag)
+        if body is None:
+            body = dumps(build())
+            response_cache.put(student_id, key, etag, body)
+        response = current_app.response_class(body, status=200, mimetype='application/json')
+
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Clients must revalidate, but may keep the body for a conditional request
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,170 @@
+import json
+import threading
+from collections import OrderedDict
+from operator import attrgetter
+from typing import Any, Callable, Dict, Sequence, Tuple
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library
+    orjson = None
+
+
+def dumps(data: Any) -> bytes:
+    """Serialize to UTF-8 JSON bytes with the fastest available backend."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+def dumps_text(data: Any) -> str:
+    """Serialize to a JSON string, e.g. for a Text column."""
+    return dumps(data).decode('utf-8')
+
+
+def loads(text) -> Any:
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def field_mapper(fields: Sequence[Tuple[str, str]], dates: Sequence[str] = ()) -> Callable[[Any], Dict[str, Any]]:
+    """
+    Build a function that maps a model row to a dict.
+    `fields` are (output key, attribute) pairs read with a single attrgetter;
+    output keys listed in `dates` are rendered with isoformat().
+    """
+    keys = tuple(key for key, _ in fields)
+    getter = attrgetter(*(attr for _, attr in fields))
+    date_keys = tuple(dates)
+
+    if len(fields) == 1:
+        def single(obj):
+            return {keys[0]: getter(obj)}
+        return single
+
+    def mapper(obj):
+        data = dict(zip(keys, getter(obj)))
+        for key in date_keys:
+            data[key] = _isoformat(data[key])
+        return data
+    return mapper
+
+
+question_fields = field_mapper([
+    ('id', 'id'),
+    ('questionText', 'question_text'),
+    ('questionType', 'question_type'),
+    ('hint', 'hint'),
+    ('sampleAnswer', 'sample_answer'),
+])
+
+task_fields = field_mapper([
+    ('id', 'id'),
+    ('title', 'title'),
+    ('description', 'description'),
+    ('difficulty', 'difficulty'),
+    ('dueDate', 'due_date'),
+    ('createdAt', 'created_at'),
+], dates=('dueDate', 'createdAt'))
+
+task_summary_fields = field_mapper([('id', 'id'), ('title', 'title')])
+
+task_detail_summary_fields = field_mapper([('id', 'id'), ('title', 'title'), ('description', 'description')])
+
+draft_fields = field_mapper([
+    ('id', 'id'),
+    ('content', 'content'),
+    ('status', 'status'),
+    ('createdAt', 'created_at'),
+    ('updatedAt', 'updated_at'),
+], dates=('createdAt', 'updatedAt'))
+
+submission_fields = field_mapper([
+    ('id', 'id'),
+    ('content', 'content'),
+    ('status', 'status'),
+    ('aiScore', 'ai_score'),
+    ('teacherScore', 'teacher_score'),
+    ('aiFeedback', 'ai_feedback'),
+    ('teacherFeedback', 'teacher_feedback'),
+    ('createdAt', 'created_at'),
+    ('updatedAt', 'updated_at'),
+], dates=('createdAt', 'updatedAt'))
+
+
+def serialize_questions(task) -> list:
+    return [question_fields(q) for q in task.questions] if task.questions else []
+
+
+def serialize_task(task, include_questions: bool = True) -> Dict[str, Any]:
+    data = task_fields(task)
+    if include_questions:
+        data['questions'] = serialize_questions(task)
+    return data
+
+
+def serialize_submission(submission, detail: bool = False) -> Dict[str, Any]:
+    """
+    Submission as returned by the student endpoints.
+    The list view keeps aiFeedback as the stored string; the detail view
+    returns it parsed and includes the task description.
+    """
+    data = submission_fields(submission)
+    task = submission.task
+    if detail:
+        data['task'] = task_detail_summary_fields(task) if task else None
+        data['aiFeedback'] = parse_feedback(submission)
+    else:
+        data['task'] = task_summary_fields(task) if task else None
+    return data
+
+
+class FeedbackCache:
+    """
+    Parsed ai_feedback per submission version, so repeated reads of an
+    unchanged submission skip the JSON parse.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Any, Tuple[Any, Dict[str, Any]]]' = OrderedDict()
+
+    def get(self, submission) -> Dict[str, Any]:
+        raw = submission.ai_feedback
+        if not raw:
+            return {}
+        version = (submission.updated_at, len(raw))
+        with self._lock:
+            entry = self._entries.get(submission.id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(submission.id)
+                return entry[1]
+
+        try:
+            parsed = loads(raw)
+        except ValueError:
+            parsed = {'feedback_text': raw}
+
+        with self._lock:
+            self._entries[submission.id] = (version, parsed)
+            self._entries.move_to_end(submission.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return parsed
+
+
+feedback_cache = FeedbackCache()
+
+
+def parse_feedback(submission) -> Dict[str, Any]:
+    """
+    Parsed AI feedback of a submission. The result is shared between
+    requests and must not be modified.
+    """
+    return feedback_cache.get(submission)
@@ -1,15 +1,54 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
-from ..models import db, Task, Submission, User
-from ..ai_services import generate_ai_feedback
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+from ..models import db, Task, Question, Submission, User, Student
+from ..grading_worker import grading_queue, AI_GRADED, TEACHER_GRADED, GRADING_FAILED
+from .response_cache import conditional_json, response_cache
+from .serializers import serialize_task, serialize_submission, draft_fields
+from services.profiling import span
+
+# Statuses after which the test can no longer be edited
+SUBMITTED_STATUSES = ('submitted', AI_GRADED, TEACHER_GRADED, GRADING_FAILED)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
 
 student_bp = Blueprint('student', __name__)
 
+def _student_version(user_id):
+    """
+    Fingerprint and last modification time of the rows behind a student's
+    listings: their submissions, the tasks and the tasks' questions. The
+    latest updated_at catches edits and the counts catch deletions. Two
+    aggregate queries.
+    """
+    sub_updated, sub_count = db.session.query(
+        func.max(Submission.updated_at), func.count(Submission.id)
+    ).filter(Submission.student_id == user_id).one()
+    task_updated, task_count, question_updated, question_count = db.session.query(
+        db.session.query(func.max(Task.updated_at)).scalar_subquery(),
+        db.session.query(func.count(Task.id)).scalar_subquery(),
+        db.session.query(func.max(Question.updated_at)).scalar_subquery(),
+        db.session.query(func.count(Question.id)).scalar_subquery(),
+    ).one()
+
+    fingerprint = f"{sub_updated}:{sub_count}:{task_updated}:{task_count}:{question_updated}:{question_count}"
+    last_modified = max((t for t in (sub_updated, task_updated, question_updated) if t is not None), default=None)
+    return fingerprint, last_modified
+
 @student_bp.route('/tasks', methods=['GET'])
 @jwt_required()
 def get_tasks():
-    """Get all tasks for the current student"""
+    """
+    Get tasks for the current student, ordered by id.
+    Query params: limit (max 200), cursor (nextCursor of the previous page),
+    includeQuestions (default true). Without limit and cursor every task is
+    returned, as before pagination; with either of them the response is one
+    page (50 tasks unless limit says otherwise) plus nextCursor.
+    Runs a fixed number of queries regardless of the number of tasks.
+    """
     current_user = get_jwt_identity()
     user_id = current_user['id']
 
@@ -18,33 +57,60 @@ def get_tasks():
     if not user or not isinstance(user, Student):
         return jsonify({'error': 'Unauthorized. Student access required.'}), 403
 
-    tasks = Task.query.all()
+    limit = None
+    if 'limit' in request.args or 'cursor' in request.args:
+        limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+        if limit <= 0:
+            return jsonify({'error': 'limit must be a positive integer'}), 400
+        limit = min(limit, MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor', type=int)
+    include_questions = request.args.get('includeQuestions', 'true').lower() != 'false'
+
+    fingerprint, last_modified = _student_version(user_id)
+    return conditional_json(
+        user_id, fingerprint, last_modified,
+        lambda: _build_tasks_page(user_id, limit, cursor, include_questions)
+    )
+
+def _build_tasks_page(user_id, limit, cursor, include_questions):
+    query = Task.query.order_by(Task.id)
+    if cursor is not None:
+        query = query.filter(Task.id > cursor)
+    if include_questions:
+        # One extra IN query for all questions of the page instead of one per task
+        query = query.options(selectinload(Task.questions))
+    if limit is None:
+        tasks = query.all()
+    else:
+        tasks = query.limit(limit + 1).all()
+        has_more = len(tasks) > limit
+        tasks = tasks[:limit]
+
+    # One IN-list lookup for this student's submissions on the page
+    submissions_by_task = {}
+    task_ids = [task.id for task in tasks]
+    if task_ids:
+        submissions = Submission.query.filter(
+            Submission.student_id == user_id,
+            Submission.task_id.in_(task_ids)
+        ).all()
+        for submission in submissions:
+            submissions_by_task.setdefault(submission.task_id, submission)
 
     # Add submission status for each task
     tasks_data = []
     for task in tasks:
-        submission = Submission.query.filter_by(task_id=task.id, student_id=user_id).first()
-        task_data = {
-            'id': task.id,
-            'title': task.title,
-            'description': task.description,
-            'difficulty': task.difficulty,
-            'dueDate': task.due_date.isoformat() if task.due_date else None,
-            'createdAt': task.created_at.isoformat() if task.created_at else None,
-            'isDone': submission is not None and submission.status == 'submitted',
-            'questions': [
-                {
-                    'id': q.id,
-                    'questionText': q.question_text,
-                    'questionType': q.question_type,
-                    'hint': q.hint,
-                    'sampleAnswer': q.sample_answer
-                } for q in task.questions
-            ] if task.questions else []
-        }
+        submission = submissions_by_task.get(task.id)
+        task_data = serialize_task(task, include_questions)
+        task_data['isDone'] = submission is not None and submission.status in SUBMITTED_STATUSES
         tasks_data.append(task_data)
 
-    return jsonify({'tasks': tasks_data}), 200
+    if limit is None:
+        return {'tasks': tasks_data}
+    return {
+        'tasks': tasks_data,
+        'nextCursor': tasks[-1].id if has_more else None
+    }
 
 @student_bp.route('/tasks/<int:task_id>', methods=['GET'])
 @jwt_required()
@@ -64,30 +130,8 @@ def get_task(task_id):
     # Get existing submission if any
     submission = Submission.query.filter_by(task_id=task.id, student_id=user_id).first()
 
-    task_data = {
-        'id': task.id,
-        'title': task.title,
-        'description': task.description,
-        'difficulty': task.difficulty,
-        'dueDate': task.due_date.isoformat() if task.due_date else None,
-        'createdAt': task.created_at.isoformat() if task.created_at else None,
-        'questions': [
-            {
-                'id': q.id,
-                'questionText': q.question_text,
-                'questionType': q.question_type,
-                'hint': q.hint,
-                'sampleAnswer': q.sample_answer
-            } for q in task.questions
-        ] if task.questions else [],
-        'submission': {
-            'id': submission.id,
-            'content': submission.content,
-            'status': submission.status,
-            'createdAt': submission.created_at.isoformat() if submission.created_at else None,
-            'updatedAt': submission.updated_at.isoformat() if submission.updated_at else None
-        } if submission else None
-    }
+    task_data = serialize_task(task)
+    task_data['submission'] = draft_fields(submission) if submission else None
 
     return jsonify({'task': task_data}), 200
 
@@ -102,27 +146,13 @@ def get_submissions():
     if not user or not isinstance(user, Student):
         return jsonify({'error': 'Unauthorized. Student access required.'}), 403
 
+    fingerprint, last_modified = _student_version(user_id)
+    return conditional_json(user_id, fingerprint, last_modified, lambda: _build_submissions(user_id))
+
+def _build_submissions(user_id):
     submissions = Submission.query.filter_by(student_id=user_id).all()
 
-    submissions_data = []
-    for sub in submissions:
-        submissions_data.append({
-            'id': sub.id,
-            'task': {
-                'id': sub.task.id,
-                'title': sub.task.title
-            } if sub.task else None,
-            'content': sub.content,
-            'status': sub.status,
-            'aiScore': sub.ai_score,
-            'teacherScore': sub.teacher_score,
-            'aiFeedback': sub.ai_feedback,
-            'teacherFeedback': sub.teacher_feedback,
-            'createdAt': sub.created_at.isoformat() if sub.created_at else None,
-            'updatedAt': sub.updated_at.isoformat() if sub.updated_at else None
-        })
-
-    return jsonify({'submissions': submissions_data}), 200
+    return {'submissions': [serialize_submission(sub) for sub in submissions]}
 
 @student_bp.route('/submissions/<int:submission_id>', methods=['GET'])
 @jwt_required()
@@ -143,32 +173,12 @@ def get_submission_detail(submission_id):
     if submission.student_id != user_id:
         return jsonify({'error': 'Unauthorized. You can only view your own submissions.'}), 403
 
-    # Parse AI feedback JSON
-    ai_feedback = {}
-    if submission.ai_feedback:
-        try:
-            ai_feedback = json.loads(submission.ai_feedback)
-        except:
-            ai_feedback = {'feedback_text': submission.ai_feedback}
-
-    submission_data = {
-        'id': submission.id,
-        'task': {
-            'id': submission.task.id,
-            'title': submission.task.title,
-            'description': submission.task.description
-        } if submission.task else None,
-        'content': submission.content,
-        'status': submission.status,
-        'aiScore': submission.ai_score,
-        'teacherScore': submission.teacher_score,
-        'aiFeedback': ai_feedback,
-        'teacherFeedback': submission.teacher_feedback,
-        'createdAt': submission.created_at.isoformat() if submission.created_at else None,
-        'updatedAt': submission.updated_at.isoformat() if submission.updated_at else None
-    }
+    fingerprint = f"{submission.id}:{submission.updated_at}:{submission.status}"
+    return conditional_json(user_id, fingerprint, submission.updated_at,
+                            lambda: _build_submission_detail(submission))
 
-    return jsonify({'submission': submission_data}), 200
+def _build_submission_detail(submission):
+    return {'submission': serialize_submission(submission, detail=True)}
 
 @student_bp.route('/submit-test/<int:task_id>', methods=['POST'])
 @jwt_required()
@@ -189,9 +199,10 @@ def submit_test(task_id):
     action = data.get('action', 'submit')  # 'save' or 'submit'
 
     # Check if submission already exists
-    submission = Submission.query.filter_by(task_id=task_id, student_id=user_id).first()
+    with span('load_submission'):
+        submission = Submission.query.filter_by(task_id=task_id, student_id=user_id).first()
 
-    if submission and submission.status == 'submitted':
+    if submission and submission.status in SUBMITTED_STATUSES:
         return jsonify({'error': 'You have already submitted this test'}), 409
 
     if not submission:
@@ -209,18 +220,15 @@ def submit_test(task_id):
     if action == 'submit':
         submission.status = 'submitted'
 
-        # Generate AI feedback
-        try:
-            task = Task.query.get(task_id)
-            ai_feedback_data = generate_ai_feedback(content, task.difficulty if task else 'N5')
-            submission.ai_feedback = json.dumps(ai_feedback_data)
-            submission.ai_score = ai_feedback_data.get('overall_score', 0)
-        except Exception as e:
-            print(f"AI feedback generation failed: {e}")
-            submission.ai_feedback = json.dumps({'feedback_text': 'AI feedback generation failed', 'overall_score': 0})
-
     submission.updated_at = datetime.utcnow()
-    db.session.commit()
+    with span('db_commit'):
+        db.session.commit()
+    response_cache.invalidate(user_id)
+
+    # AI grading runs in the background and moves the submission to ai_graded
+    if action == 'submit':
+        with span('enqueue_grading'):
+            grading_queue.enqueue(current_app._get_current_object(), submission.id)
 
     message = 'Draft saved successfully' if action == 'save' else 'Test submitted successfully'
 
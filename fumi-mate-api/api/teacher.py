@@ -0,0 +1,125 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from datetime import datetime
+from sqlalchemy.exc import SQLAlchemyError
+from ..models import db, Task, Submission, User, Teacher
+from ..grading_worker import TEACHER_GRADED
+from .response_cache import response_cache
+from services.profiling import span
+
+MAX_BULK_GRADES = 500
+
+teacher_bp = Blueprint('teacher', __name__)
+
+def _parse_grade(entry):
+    """
+    Validate one bulk-grade entry.
+    Returns ((submission_id, score, feedback), None) or (None, error message).
+    """
+    if not isinstance(entry, dict):
+        return None, 'Each grade must be an object'
+
+    submission_id = entry.get('submissionId')
+    score = entry.get('teacherScore')
+    feedback = entry.get('teacherFeedback')
+
+    if not isinstance(submission_id, int) or isinstance(submission_id, bool):
+        return None, 'submissionId must be an integer'
+    if not isinstance(score, (int, float)) or isinstance(score, bool) or not 0 <= score <= 100:
+        return None, 'teacherScore must be a number between 0 and 100'
+    if feedback is not None and not isinstance(feedback, str):
+        return None, 'teacherFeedback must be a string'
+
+    return (submission_id, score, feedback), None
+
+@teacher_bp.route('/submissions/grade', methods=['POST'])
+@jwt_required()
+def bulk_grade():
+    """
+    Grade many submissions in one request.
+    Request body: {"grades": [{"submissionId": int, "teacherScore": number,
+                               "teacherFeedback": "string" (optional)}, ...]}
+    Every valid entry moves its submission to teacher_graded and is committed
+    in a single transaction; invalid entries are reported in `results` (in
+    request order) without blocking the others. Only submissions to tasks
+    the teacher created can be graded.
+    """
+    current_user = get_jwt_identity()
+    user_id = current_user['id']
+
+    user = User.query.get(user_id)
+    if not user or not isinstance(user, Teacher):
+        return jsonify({'error': 'Unauthorized. Teacher access required.'}), 403
+
+    data = request.get_json()
+    grades = data.get('grades') if isinstance(data, dict) else None
+    if not isinstance(grades, list) or not grades:
+        return jsonify({'error': 'grades must be a non-empty list'}), 400
+    if len(grades) > MAX_BULK_GRADES:
+        return jsonify({'error': f'At most {MAX_BULK_GRADES} grades per request'}), 400
+
+    results = []
+    parsed = {}
+    for entry in grades:
+        grade, error = _parse_grade(entry)
+        submission_id = entry.get('submissionId') if isinstance(entry, dict) else None
+        if error is None and grade[0] in parsed:
+            error = 'Duplicate submissionId in this request'
+        if error:
+            results.append({'submissionId': submission_id, 'ok': False, 'error': error})
+            continue
+        parsed[grade[0]] = grade
+        results.append({'submissionId': submission_id, 'ok': True})
+
+    # One IN query for every submission of the request, limited to the
+    # teacher's own tasks
+    with span('load_submissions'):
+        submissions = {
+            submission.id: submission
+            for submission in Submission.query.join(Task, Task.id == Submission.task_id).filter(
+                Submission.id.in_(list(parsed)),
+                Task.teacher_id == user_id
+            ).all()
+        } if parsed else {}
+
+    now = datetime.utcnow()
+    students = set()
+    for result in results:
+        if not result['ok']:
+            continue
+        submission = submissions.get(result['submissionId'])
+        if submission is None:
+            # Other teachers' submissions are reported like missing ones
+            result.update(ok=False, error='Submission not found')
+            continue
+        if submission.status == 'draft':
+            result.update(ok=False, error='Submission has not been submitted')
+            continue
+
+        _, score, feedback = parsed[submission.id]
+        submission.teacher_score = score
+        if feedback is not None:
+            submission.teacher_feedback = feedback
+        submission.status = TEACHER_GRADED
+        submission.updated_at = now
+        students.add(submission.student_id)
+        result['status'] = TEACHER_GRADED
+
+    graded = sum(1 for result in results if result['ok'])
+    if graded:
+        # The session flushes the updates together and commits them at once
+        try:
+            with span('db_commit'):
+                db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            print(f"Bulk grading failed: {e}")
+            return jsonify({'error': 'Grades could not be saved; none were applied'}), 500
+        for student_id in students:
+            response_cache.invalidate(student_id)
+
+    return jsonify({
+        'graded': graded,
+        'failed': len(results) - graded,
+        'results': results
+    }), 200
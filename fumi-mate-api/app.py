@@ -6,14 +6,41 @@ import os
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
+def create_app():
+    """
+    Build the Flask app. Served by `python app.py` for development, and in
+    production by gunicorn: gunicorn -c gunicorn.conf.py "app:create_app()"
+    """
+    app = Flask(__name__)
 
-# Enable CORS
-CORS(app)
+    # Enable CORS
+    CORS(app)
 
-# Register blueprint
-from routes.tasks import tasks_bp
-app.register_blueprint(tasks_bp, url_prefix='/api/tasks')
+    # Request latency histograms and GET /metrics (Prometheus text format)
+    from services.metrics import init_app as init_metrics
+    init_metrics(app)
+
+    # Opt-in cProfile per request (X-Profile: $PROFILE_TOKEN or PROFILE_SAMPLE_RATE)
+    from services.profiling import init_app as init_profiling
+    init_profiling(app)
+
+    # Configure the shared Gemini client once per process
+    from services.gemini_client import init_gemini
+    init_gemini()
+
+    # Liveness and readiness probes at /health and /ready
+    from routes.health import health_bp
+    app.register_blueprint(health_bp)
+
+    # Register blueprint
+    from routes.tasks import tasks_bp
+    app.register_blueprint(tasks_bp, url_prefix='/api/tasks')
+
+    # Start refilling pre-generated questions (no-op unless TASK_POOL_ENABLED)
+    from services.gemini_service import start_question_pool
+    start_question_pool()
+
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,79 @@
+"""
+Check that booting the app stays within its import-time budget.
+
+    python check_import_time.py --budget-ms 400
+
+Runs `python -X importtime` on create_app() in a fresh interpreter, with
+GEMINI_PRELOAD=0 so the background SDK import does not run. Fails (exit
+status 1) if the imports take longer than the budget or if a module that
+must load lazily (the Gemini SDK, grpc, numpy) is imported during boot.
+Prints the slowest top-level imports either way.
+
+tests/test_import_time.py runs the same check as part of the test suite.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Loaded on first use; importing any of these at boot is a regression
+LAZY_MODULES = ('google.generativeai', 'grpc', 'numpy')
+
+BOOT = 'from app import create_app; create_app()'
+
+DEFAULT_BUDGET_MS = float(os.getenv('IMPORT_BUDGET_MS', 400))
+
+
+def measure():
+    env = dict(os.environ, GEMINI_PRELOAD='0', GEMINI_WARMUP='0', TASK_POOL_ENABLED='0')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', BOOT],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"App failed to boot:\n{result.stderr}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imports.append((name[1:].rstrip(), int(cumulative)))
+    return imports
+
+
+def check(budget_ms: float):
+    """Boot the app once; returns (top-level imports, total ms, failures)."""
+    imports = measure()
+    # Nested imports are indented; the top-level ones add up to the total
+    top_level = [(name, us) for name, us in imports if not name.startswith(' ')]
+    total_ms = sum(us for _, us in top_level) / 1000
+
+    failures = []
+    loaded = {name.strip() for name, _ in imports}
+    for module in LAZY_MODULES:
+        if module in loaded:
+            failures.append(f"{module} is imported at boot")
+    if total_ms > budget_ms:
+        failures.append(f"imports took {total_ms:.1f} ms, over the {budget_ms:.0f} ms budget")
+    return top_level, total_ms, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    top_level, total_ms, failures = check(args.budget_ms)
+    for name, us in sorted(top_level, key=lambda item: -item[1])[:args.top]:
+        print(f"{us / 1000:9.1f} ms  {name.strip()}")
+    print(f"{total_ms:9.1f} ms  total (budget {args.budget_ms:.0f} ms)")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
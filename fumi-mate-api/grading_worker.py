@@ -0,0 +1,181 @@
+import os
+import queue
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from .ai_services import generate_ai_feedback
+from .api.response_cache import response_cache
+from .api.serializers import dumps_text
+from services.profiling import profiler, span
+
+# Submission status once AI grading has finished (SubmissionStatus 2 in the frontend)
+AI_GRADED = 'ai_graded'
+# Submission status once a teacher has graded it (SubmissionStatus 3 in the frontend)
+TEACHER_GRADED = 'teacher_graded'
+# Submission status once AI grading has failed max_attempts times; it is not
+# retried again, but a teacher can still grade it
+GRADING_FAILED = 'grading_failed'
+
+
+class GradingQueue:
+    """
+    Background pool that grades submitted tests outside the request.
+    Failed jobs are retried with exponential backoff; after the last attempt
+    the submission moves to grading_failed with a failure feedback.
+    The queue lives in memory, so when the workers start they queue every
+    submission still 'submitted' in the database; that picks up jobs lost
+    with a previous process, but not the ones that already failed.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_attempts: Optional[int] = None,
+                 retry_delay: Optional[float] = None):
+        self.workers = workers or int(os.getenv('GRADING_WORKERS', 2))
+        self.max_attempts = max_attempts or int(os.getenv('GRADING_MAX_ATTEMPTS', 3))
+        self.retry_delay = retry_delay or float(os.getenv('GRADING_RETRY_DELAY', 2))
+
+        self._queue: 'queue.Queue[tuple]' = queue.Queue()
+        self._lock = threading.Lock()
+        self._app = None
+        self._threads = []
+        self._in_flight = 0
+        self._retrying = 0
+        # Submissions queued, in flight or waiting for a retry
+        self._pending = set()
+        self._stats = {'enqueued': 0, 'recovered': 0, 'graded': 0, 'retried': 0, 'failed': 0}
+
+    def enqueue(self, app, submission_id: int) -> None:
+        """Queue a committed submission for grading."""
+        self.start(app)
+        self._put(submission_id, 'enqueued')
+
+    def _put(self, submission_id: int, counter: str) -> None:
+        with self._lock:
+            if submission_id in self._pending:
+                return
+            self._pending.add(submission_id)
+            self._stats[counter] += 1
+        self._queue.put((submission_id, 1))
+
+    def start(self, app) -> None:
+        """Start the workers and queue the submissions still waiting for AI grading."""
+        with self._lock:
+            if self._threads:
+                return
+            self._app = app
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'grading-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        self._recover()
+
+    def _recover(self) -> None:
+        from .models import Submission
+
+        with self._app.app_context():
+            try:
+                rows = (Submission.query.with_entities(Submission.id)
+                        .filter(Submission.status == 'submitted')
+                        .order_by(Submission.id).all())
+            except Exception as e:
+                print(f"Could not load submissions waiting for grading: {e}")
+                return
+        for (submission_id,) in rows:
+            self._put(submission_id, 'recovered')
+
+    def _run(self) -> None:
+        while True:
+            submission_id, attempt = self._queue.get()
+            with self._lock:
+                self._in_flight += 1
+            try:
+                self._grade(submission_id)
+                with self._lock:
+                    self._stats['graded'] += 1
+                    self._pending.discard(submission_id)
+            except Exception as e:
+                print(f"AI grading failed for submission {submission_id} (attempt {attempt}): {e}")
+                self._retry_or_fail(submission_id, attempt)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                self._queue.task_done()
+
+    def _grade(self, submission_id: int) -> None:
+        from .models import db, Task, Submission
+
+        # Grading jobs are sampled at PROFILE_SAMPLE_RATE like requests
+        with self._app.app_context(), profiler.maybe_profile(f"grading submission {submission_id}"):
+            try:
+                with span('load'):
+                    submission = Submission.query.get(submission_id)
+                    # Skip deleted submissions and ones graded by an earlier attempt
+                    if not submission or submission.status != 'submitted':
+                        return
+                    task = Task.query.get(submission.task_id)
+
+                # Raise instead of storing the placeholder, so the job is retried
+                ai_feedback_data = generate_ai_feedback(submission.content, task.difficulty if task else 'N5',
+                                                        fallback=False)
+                submission.ai_feedback = dumps_text(ai_feedback_data)
+                submission.ai_score = ai_feedback_data.get('overall_score', 0)
+                submission.status = AI_GRADED
+                submission.updated_at = datetime.utcnow()
+                with span('db_commit'):
+                    db.session.commit()
+                response_cache.invalidate(submission.student_id)
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def _retry_or_fail(self, submission_id: int, attempt: int) -> None:
+        if attempt < self.max_attempts:
+            delay = self.retry_delay * (2 ** (attempt - 1))
+            with self._lock:
+                self._stats['retried'] += 1
+                self._retrying += 1
+            timer = threading.Timer(delay, self._requeue, args=(submission_id, attempt + 1))
+            timer.daemon = True
+            timer.start()
+            return
+
+        self._mark_failed(submission_id)
+        with self._lock:
+            self._stats['failed'] += 1
+            self._pending.discard(submission_id)
+
+    def _requeue(self, submission_id: int, attempt: int) -> None:
+        with self._lock:
+            self._retrying -= 1
+        self._queue.put((submission_id, attempt))
+
+    def _mark_failed(self, submission_id: int) -> None:
+        from .models import db, Submission
+
+        with self._app.app_context():
+            try:
+                submission = Submission.query.get(submission_id)
+                if submission and submission.status == 'submitted':
+                    submission.ai_feedback = dumps_text({'feedback_text': 'AI feedback generation failed', 'overall_score': 0})
+                    submission.status = GRADING_FAILED
+                    submission.updated_at = datetime.utcnow()
+                    db.session.commit()
+                    response_cache.invalidate(submission.student_id)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Could not record grading failure for submission {submission_id}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queued = self._queue.qsize()
+            return {
+                **self._stats,
+                'queued': queued,
+                'inFlight': self._in_flight,
+                'retrying': self._retrying,
+                'backlog': queued + self._in_flight + self._retrying,
+                'workers': self.workers,
+            }
+
+
+grading_queue = GradingQueue()
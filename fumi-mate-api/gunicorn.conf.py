@@ -0,0 +1,21 @@
+"""
+Production server settings:
+
+    gunicorn -c gunicorn.conf.py "app:create_app()"
+
+Flask runs async views (POST /api/tasks/generate) by blocking one request
+thread per request, so each worker uses the threaded gthread worker. While
+a request waits, its Gemini call is on the worker's shared async runtime
+(services.async_runtime), which holds every in-flight call of the process on
+one event loop; generations queued with "async": true hold no request thread
+at all. Workers share rate limits through ADMISSION_PATH, and each keeps its
+own task cache and runtime loop.
+"""
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', 64))
+# Model calls are bounded by GEMINI_TIMEOUT; leave room for shards and retries
+timeout = int(os.getenv('WEB_TIMEOUT', 120))
@@ -0,0 +1,157 @@
+"""
+Show how task generation scales with concurrency.
+
+    python loadtest.py --concurrency 1 10 50 100 200 --latency 1.0
+    python loadtest.py --url http://localhost:5000 --concurrency 10 50
+
+Without --url, Gemini is replaced by a fake model that answers after
+--latency seconds, and each level is run twice through the Flask app, with
+at most WEB_THREADS requests handled at once as under gunicorn's gthread
+worker: once through a blocking view that calls generate_task in the
+request thread (the view before the async runtime), and once through
+POST /api/tasks/generate, which goes through Flask's async view support to
+generate_task_async on the shared runtime loop. Admission is turned off so
+only generation is measured. With --url the requests go over HTTP to a
+running server; pass --async to queue them as jobs.
+Every request uses noCache so each one reaches the model. The requests
+share one client address and so one admission bucket: start the server
+with ADMISSION_ENABLED=0 (or high ADMISSION_*_RATE) to measure throughput.
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import request, jsonify
+
+from app import create_app
+from routes.tasks import parse_generate_request
+from services.admission import admission
+from services.async_runtime import runtime
+from services.gemini_client import pool
+from services import gemini_service
+
+
+class FakeModel:
+    """Stands in for GenerativeModel: a fixed delay, then a one-question task."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    @staticmethod
+    def _response():
+        task = {'taskId': 1, 'title': 'Load test', 'questions': [
+            {'id': 1, 'question': 'これは何ですか。', 'answer': 'ペンです。'}
+        ]}
+        return type('Response', (), {'text': json.dumps(task, ensure_ascii=False)})()
+
+    def generate_content(self, prompt):
+        time.sleep(self.latency)
+        return self._response()
+
+    async def generate_content_async(self, prompt):
+        await asyncio.sleep(self.latency)
+        return self._response()
+
+
+def generation_body(i):
+    return {'topic': f"topic {i}", 'level': 'N5', 'numQuestions': 1, 'noCache': True}
+
+
+def create_loadtest_app():
+    app = create_app()
+
+    @app.route('/loadtest/generate-blocking', methods=['POST'])
+    def generate_blocking():
+        params, error = parse_generate_request(request.get_json())
+        if error:
+            return jsonify({'error': error}), 400
+        return jsonify(gemini_service.generate_task(**params)), 200
+
+    return app
+
+
+def run_app(app, path, concurrency, threads):
+    def one(i):
+        response = app.test_client().post(path, json=generation_body(i))
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} answered {response.status_code}")
+
+    with ThreadPoolExecutor(max_workers=min(concurrency, threads)) as executor:
+        started = time.perf_counter()
+        list(executor.map(one, range(concurrency)))
+    return time.perf_counter() - started
+
+
+def run_http(url, concurrency, queue_jobs):
+    statuses = []
+    lock = threading.Lock()
+
+    def one(i):
+        body = json.dumps({**generation_body(i), 'async': queue_jobs}).encode('utf-8')
+        http_request = urllib.request.Request(f"{url}/api/tasks/generate", data=body, method='POST', headers={
+            'Content-Type': 'application/json',
+        })
+        try:
+            with urllib.request.urlopen(http_request, timeout=120) as response:
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except OSError:
+            status = 'error'
+        with lock:
+            statuses.append(status)
+
+    threads = [threading.Thread(target=one, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    counts = {}
+    for status in statuses:
+        counts[status] = counts.get(status, 0) + 1
+    return elapsed, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50, 100, 200])
+    parser.add_argument('--latency', type=float, default=1.0, help='fake model latency in seconds')
+    parser.add_argument('--threads', type=int, default=int(os.getenv('WEB_THREADS', 64)),
+                        help='request threads handling both paths')
+    parser.add_argument('--url', help='load test a running server instead')
+    parser.add_argument('--async', dest='queue_jobs', action='store_true',
+                        help='with --url, queue generations as jobs')
+    args = parser.parse_args()
+
+    if args.url:
+        for concurrency in args.concurrency:
+            elapsed, counts = run_http(args.url.rstrip('/'), concurrency, args.queue_jobs)
+            print(f"{concurrency:>5} concurrent  {elapsed:7.2f}s  {concurrency / elapsed:8.1f} req/s  {counts}")
+        return
+
+    model = FakeModel(args.latency)
+    pool.get_model = lambda model_name=None: model
+    admission.enabled = False
+    app = create_loadtest_app()
+
+    print(f"fake model latency {args.latency}s, {args.threads} request threads, "
+          f"GEMINI_CALL_WORKERS={os.getenv('GEMINI_CALL_WORKERS', 16)}")
+    print(f"{'concurrent':>10}  {'blocking':>16}  {'async':>16}")
+    for concurrency in args.concurrency:
+        blocking = run_app(app, '/loadtest/generate-blocking', concurrency, args.threads)
+        async_elapsed = run_app(app, '/api/tasks/generate', concurrency, args.threads)
+        print(f"{concurrency:>10}  {blocking:6.2f}s {concurrency / blocking:6.1f}/s  "
+              f"{async_elapsed:6.2f}s {concurrency / async_elapsed:6.1f}/s")
+    print(f"runtime: {runtime.stats()}")
+
+
+if __name__ == '__main__':
+    main()
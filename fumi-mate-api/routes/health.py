@@ -0,0 +1,25 @@
+import os
+from flask import Blueprint, jsonify
+from services.gemini_client import pool
+
+health_bp = Blueprint('health', __name__)
+
+@health_bp.route('/health', methods=['GET'])
+def health():
+    """
+    Liveness: the process is up and serving requests.
+    Does not touch the Gemini SDK, so it answers as soon as the worker boots.
+    """
+    return jsonify({'status': 'ok'}), 200
+
+@health_bp.route('/ready', methods=['GET'])
+def ready():
+    """
+    Readiness: the Gemini client is imported and configured, so generation
+    will reach the model instead of falling back to mock data.
+    """
+    if pool.ready():
+        return jsonify({'status': 'ready'}), 200
+    # Without an API key the client never becomes ready
+    status = 'starting' if os.getenv('GEMINI_API_KEY') else 'unconfigured'
+    return jsonify({'status': status}), 503
@@ -1,35 +1,273 @@
-from flask import Blueprint, request, jsonify
-from services.gemini_service import generate_task
+import json
+from flask import Blueprint, Response, current_app, request, jsonify, url_for, stream_with_context
+from services.gemini_service import generate_task_async, stream_task
+from services.gemini_client import pool
+from services.task_cache import cache
+from services.task_jobs import jobs, QueueFullError, DONE, FAILED
+from services.task_batch import run_batch
+from services.question_pool import question_pool
+from services import resilience
+from services.admission import admission, AdmissionRejected, retry_after_header
+from services.async_runtime import runtime
+
+try:
+    from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+except ImportError:  # JWT auth is optional; requests are then keyed by client address
+    verify_jwt_in_request = get_jwt_identity = None
 
 tasks_bp = Blueprint('tasks', __name__)
 
+MAX_JOB_WAIT_SECONDS = 30
+MAX_BATCH_ITEMS = 500
+
+def parse_generate_request(data):
+    """
+    Validate a generate request body.
+    Returns (params, None) on success or (None, error message) on failure.
+    """
+    if not isinstance(data, dict) or not data:
+        return None, 'No JSON data provided'
+
+    topic = data.get('topic')
+    level = data.get('level')
+    num_questions = data.get('numQuestions')
+
+    if not all([topic, level, num_questions]):
+        return None, 'Missing required fields: topic, level, numQuestions'
+
+    # The cache key normalizes them as text
+    if not isinstance(topic, str) or not isinstance(level, str):
+        return None, 'topic and level must be strings'
+
+    if not isinstance(num_questions, int) or num_questions <= 0:
+        return None, 'numQuestions must be a positive integer'
+
+    return {
+        'topic': topic,
+        'level': level,
+        'num_questions': num_questions,
+        'use_cache': not data.get('noCache', False),
+        'refresh': bool(data.get('refresh', False)),
+    }, None
+
+def admission_user():
+    """
+    The key requests are rate limited by: the user id of a valid JWT when the
+    app verifies JWTs, otherwise the client address. Client-supplied headers
+    are not trusted, since any caller could pick a fresh key per request.
+    """
+    identity = _jwt_identity()
+    if identity is not None:
+        return f"id:{identity}"
+    return f"ip:{request.remote_addr or 'unknown'}"
+
+def _jwt_identity():
+    if verify_jwt_in_request is None or 'flask-jwt-extended' not in current_app.extensions:
+        return None
+    try:
+        verify_jwt_in_request(optional=True)
+    except Exception:
+        # An invalid or expired token; the address still limits the caller
+        return None
+    identity = get_jwt_identity()
+    # The api blueprints issue identities as {'id': ..., ...}
+    if isinstance(identity, dict):
+        identity = identity.get('id')
+    return identity
+
+def admit_request(cost=1):
+    """
+    Wait for the admission layer to let a model-backed request through.
+    Returns None when admitted, or a 429 response with Retry-After.
+    """
+    try:
+        admission.admit(admission_user(), cost)
+    except AdmissionRejected as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = retry_after_header(e.retry_after)
+        return response, 429
+    return None
+
 @tasks_bp.route('/generate', methods=['POST'])
-def generate():
+async def generate():
     """
     Generate a task with questions using Gemini AI.
     Request body: {"topic": "string", "level": "string", "numQuestions": int}
+    Optional flags: "refresh": true regenerates and overwrites the cached task,
+    "noCache": true bypasses the cache entirely, "async": true (or ?mode=async)
+    queues the generation and returns a job id immediately.
+    Generation runs on the shared async runtime: the model calls of every
+    request share one event loop and one async client instead of each
+    needing its own client or call thread. The view itself still holds its
+    request thread until the task is ready (see gunicorn.conf.py).
     """
     try:
         data = request.get_json()
+        params, error = parse_generate_request(data)
+        if error:
+            return jsonify({'error': error}), 400
 
-        if not data:
-            return jsonify({'error': 'No JSON data provided'}), 400
-
-        topic = data.get('topic')
-        level = data.get('level')
-        num_questions = data.get('numQuestions')
+        rejected = admit_request()
+        if rejected:
+            return rejected
 
-        if not all([topic, level, num_questions]):
-            return jsonify({'error': 'Missing required fields: topic, level, numQuestions'}), 400
+        if data.get('async') or request.args.get('mode') == 'async':
+            try:
+                job = jobs.submit(generate_task_async, **params)
+            except QueueFullError:
+                response = jsonify({'error': 'Too many pending generation jobs, try again later'})
+                response.headers['Retry-After'] = '5'
+                return response, 503
 
-        if not isinstance(num_questions, int) or num_questions <= 0:
-            return jsonify({'error': 'numQuestions must be a positive integer'}), 400
+            status_url = url_for('tasks.job_status', job_id=job['jobId'])
+            response = jsonify({
+                'jobId': job['jobId'],
+                'status': job['status'],
+                'statusUrl': status_url,
+                'eventsUrl': url_for('tasks.job_events', job_id=job['jobId'])
+            })
+            response.headers['Location'] = status_url
+            return response, 202
 
         # Generate task
-        task_data = generate_task(topic, level, num_questions)
+        task_data = await runtime.run(generate_task_async(**params))
 
         return jsonify(task_data), 200
 
     except Exception as e:
         print(f"Error in generate endpoint: {e}")
         return jsonify({'error': 'Internal server error'}), 500
+
+@tasks_bp.route('/generate/batch', methods=['POST'])
+def generate_batch():
+    """
+    Generate many tasks in one call.
+    Request body: {"items": [{"topic", "level", "numQuestions", ...}, ...],
+                   "concurrency": int (optional), "mock": bool (optional)}
+    Invalid items are reported individually; the rest are still generated.
+    """
+    try:
+        data = request.get_json()
+        items = data.get('items') if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'items must be a non-empty list'}), 400
+        if len(items) > MAX_BATCH_ITEMS:
+            return jsonify({'error': f'At most {MAX_BATCH_ITEMS} items per batch'}), 400
+
+        concurrency = data.get('concurrency')
+        if concurrency is not None and (not isinstance(concurrency, int) or concurrency <= 0):
+            return jsonify({'error': 'concurrency must be a positive integer'}), 400
+
+        specs = []
+        for item in items:
+            if not isinstance(item, dict):
+                specs.append({'error': 'Item must be a JSON object'})
+                continue
+            params, error = parse_generate_request(item)
+            specs.append({'error': error} if error else {'params': params})
+
+        # Every valid item may call the model; mock batches never do
+        mock = bool(data.get('mock', False))
+        if not mock:
+            rejected = admit_request(sum(1 for spec in specs if 'params' in spec))
+            if rejected:
+                return rejected
+
+        return jsonify(run_batch(specs, concurrency, mock=mock)), 200
+
+    except Exception as e:
+        print(f"Error in batch generate endpoint: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@tasks_bp.route('/generate/stream', methods=['POST'])
+def generate_stream():
+    """
+    Generate a task and stream each question as soon as it is complete.
+    Same body as /generate. Responds with Server-Sent Events when the client
+    accepts text/event-stream (or ?format=sse), otherwise with NDJSON.
+    """
+    data = request.get_json(silent=True)
+    params, error = parse_generate_request(data)
+    if error:
+        return jsonify({'error': error}), 400
+
+    rejected = admit_request()
+    if rejected:
+        return rejected
+
+    fmt = request.args.get('format')
+    if fmt is None:
+        fmt = 'sse' if request.accept_mimetypes.best == 'text/event-stream' else 'ndjson'
+
+    def sse(events):
+        for event in events:
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+
+    def ndjson(events):
+        for event in events:
+            yield json.dumps(event, ensure_ascii=False) + '\n'
+
+    events = stream_task(**params)
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    if fmt == 'sse':
+        return Response(stream_with_context(sse(events)), mimetype='text/event-stream', headers=headers)
+    return Response(stream_with_context(ndjson(events)), mimetype='application/x-ndjson', headers=headers)
+
+@tasks_bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """
+    Poll a generation job.
+    ?wait=<seconds> holds the request until the status changes (max 30s).
+    """
+    wait = request.args.get('wait', type=float)
+    if wait:
+        job = jobs.get(job_id)
+        if job is not None and job['status'] not in (DONE, FAILED):
+            job = jobs.wait(job_id, job['status'], min(wait, MAX_JOB_WAIT_SECONDS))
+    else:
+        job = jobs.get(job_id)
+
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    return jsonify(job), 200
+
+@tasks_bp.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    Subscribe to a generation job as Server-Sent Events.
+    One event is sent per status change; the stream ends when the job finishes.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    def events(job):
+        yield f"event: {job['status']}\ndata: {json.dumps(job, ensure_ascii=False)}\n\n"
+        while job['status'] not in (DONE, FAILED):
+            latest = jobs.wait(job_id, job['status'], MAX_JOB_WAIT_SECONDS)
+            if latest is None:
+                return
+            if latest['status'] == job['status']:
+                # Keep idle connections alive through proxies
+                yield ": keep-alive\n\n"
+                continue
+            job = latest
+            yield f"event: {job['status']}\ndata: {json.dumps(job, ensure_ascii=False)}\n\n"
+
+    return Response(events(job), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@tasks_bp.route('/stats', methods=['GET'])
+def stats():
+    """
+    Runtime statistics for the task generation pipeline.
+    """
+    return jsonify({
+        'gemini': pool.stats(),
+        'cache': cache.stats(),
+        'jobs': jobs.stats(),
+        'pool': question_pool.stats(),
+        'resilience': resilience.stats(),
+        'admission': admission.stats(),
+        'asyncRuntime': runtime.stats()
+    }), 200
@@ -0,0 +1,268 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Any, Optional, Tuple
+
+DEFAULT_ADMISSION_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'admission.sqlite3')
+
+GLOBAL_BUCKET = '*'
+
+
+class AdmissionRejected(Exception):
+    """The request was shed; retry_after is a hint in seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBuckets:
+    """
+    Token buckets kept in a SQLite file (WAL), so every worker process on the
+    host draws from the same buckets. A request takes `cost` tokens from its
+    user's bucket and the global bucket in one transaction, or from neither.
+    Buckets may go into debt so a request costing more than the burst can
+    still be admitted once the buckets are full; later requests then wait
+    for the debt to be repaid.
+    """
+
+    def __init__(self, path: Optional[str] = None, user_rate: Optional[float] = None,
+                 user_burst: Optional[float] = None, global_rate: Optional[float] = None,
+                 global_burst: Optional[float] = None):
+        self.path = path or os.getenv('ADMISSION_PATH', DEFAULT_ADMISSION_PATH)
+        # Rates are configured per minute and kept per second
+        self.user_rate = (user_rate if user_rate is not None else float(os.getenv('ADMISSION_USER_RATE', 10))) / 60
+        self.user_burst = user_burst if user_burst is not None else float(os.getenv('ADMISSION_USER_BURST', 5))
+        self.global_rate = (global_rate if global_rate is not None else float(os.getenv('ADMISSION_GLOBAL_RATE', 60))) / 60
+        self.global_burst = global_burst if global_burst is not None else float(os.getenv('ADMISSION_GLOBAL_BURST', 20))
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS token_buckets ('
+                ' key TEXT PRIMARY KEY,'
+                ' tokens REAL NOT NULL,'
+                ' updated_at REAL NOT NULL)'
+            )
+            self._local.conn = conn
+        return conn
+
+    def _refilled(self, conn, key: str, rate: float, burst: float, now: float) -> float:
+        row = conn.execute('SELECT tokens, updated_at FROM token_buckets WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return burst
+        tokens, updated_at = row
+        return min(burst, tokens + max(0.0, now - updated_at) * rate)
+
+    def try_acquire(self, user: str, cost: float = 1) -> Tuple[bool, float]:
+        """
+        Take `cost` tokens from the user's and the global bucket if both can
+        afford it. Returns (admitted, seconds until it could be admitted).
+        """
+        buckets = ((f"user:{user}", self.user_rate, self.user_burst),
+                   (GLOBAL_BUCKET, self.global_rate, self.global_burst))
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            levels = [(key, rate, burst, self._refilled(conn, key, rate, burst, now)) for key, rate, burst in buckets]
+            # A bucket admits once it holds the cost, or is full for costs above the burst
+            wait = max(max(0.0, min(cost, burst) - tokens) / rate for _, rate, burst, tokens in levels)
+            admitted = wait == 0
+            for key, _, _, tokens in levels:
+                conn.execute(
+                    'INSERT OR REPLACE INTO token_buckets (key, tokens, updated_at) VALUES (?, ?, ?)',
+                    (key, tokens - cost if admitted else tokens, now)
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return admitted, wait
+
+
+class _Waiter:
+    __slots__ = ('user', 'cost', 'deadline', 'event', 'admitted')
+
+    def __init__(self, user: str, cost: float, deadline: float):
+        self.user = user
+        self.cost = cost
+        self.deadline = deadline
+        self.event = threading.Event()
+        self.admitted = False
+
+
+class AdmissionController:
+    """
+    Admission for model-backed requests. A request that the buckets cannot
+    admit right away waits in a queue with one lane per user; a dispatcher
+    thread serves the lanes round-robin, so a user with many queued requests
+    cannot starve the others. Requests are shed with AdmissionRejected when
+    the queue is full or when they would wait longer than max_wait.
+    """
+
+    def __init__(self, buckets: Optional[TokenBuckets] = None, max_wait: Optional[float] = None,
+                 max_queue: Optional[int] = None, enabled: Optional[bool] = None):
+        self.buckets = buckets or TokenBuckets()
+        self.max_wait = max_wait if max_wait is not None else float(os.getenv('ADMISSION_MAX_WAIT', 10))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv('ADMISSION_MAX_QUEUE', 64))
+        if enabled is None:
+            enabled = os.getenv('ADMISSION_ENABLED', '1').lower() not in ('0', 'false', 'no')
+        self.enabled = enabled
+
+        self._lock = threading.Condition()
+        self._lanes: 'OrderedDict[str, deque]' = OrderedDict()
+        self._queued = 0
+        self._dispatcher: Optional[threading.Thread] = None
+        self._stats = {'admitted': 0, 'queued': 0, 'rejectedQueueFull': 0, 'rejectedTimeout': 0, 'errors': 0}
+
+    def admit(self, user: str, cost: float = 1) -> None:
+        """Return once the request may proceed; raise AdmissionRejected otherwise."""
+        if not self.enabled or cost <= 0:
+            return
+
+        # Skip the queue only when nobody is waiting, so queued users keep
+        # their turn. The bucket transaction runs outside the lock.
+        with self._lock:
+            queued = self._queued
+        if not queued:
+            admitted, wait = self._try(user, cost)
+            if admitted:
+                with self._lock:
+                    self._stats['admitted'] += 1
+                return
+        else:
+            wait = self.max_wait
+
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self._stats['rejectedQueueFull'] += 1
+                raise AdmissionRejected('Too many requests are waiting for the model', max(wait, 1))
+            if wait > self.max_wait:
+                self._stats['rejectedTimeout'] += 1
+                raise AdmissionRejected('Rate limit exceeded', wait)
+
+            waiter = _Waiter(user, cost, time.monotonic() + self.max_wait)
+            self._lanes.setdefault(user, deque()).append(waiter)
+            self._queued += 1
+            self._stats['queued'] += 1
+            self._ensure_dispatcher()
+            self._lock.notify_all()
+
+        waiter.event.wait(self.max_wait + 1)
+        with self._lock:
+            if waiter.admitted:
+                return
+            self._remove(waiter)
+            self._stats['rejectedTimeout'] += 1
+        raise AdmissionRejected('Rate limit exceeded', self._retry_hint(cost))
+
+    def _try(self, user: str, cost: float) -> Tuple[bool, float]:
+        try:
+            return self.buckets.try_acquire(user, cost)
+        except sqlite3.Error as e:
+            # Fail open: a broken limiter must not take the service down
+            print(f"Admission store error: {e}")
+            with self._lock:
+                self._stats['errors'] += 1
+            return True, 0.0
+
+    def _retry_hint(self, cost: float) -> float:
+        return max(1.0, cost / min(self.buckets.user_rate, self.buckets.global_rate))
+
+    def _remove(self, waiter: _Waiter) -> None:
+        # Caller holds the lock
+        lane = self._lanes.get(waiter.user)
+        if lane is not None and waiter in lane:
+            lane.remove(waiter)
+            self._queued -= 1
+            if not lane:
+                del self._lanes[waiter.user]
+
+    def _ensure_dispatcher(self) -> None:
+        # Caller holds the lock
+        if self._dispatcher is None or not self._dispatcher.is_alive():
+            self._dispatcher = threading.Thread(target=self._dispatch, name='admission', daemon=True)
+            self._dispatcher.start()
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._lock:
+                while not self._queued:
+                    self._lock.wait()
+
+                now = time.monotonic()
+                heads = []
+                # One pass over the lanes in round-robin order, at most one admission each
+                for user in list(self._lanes):
+                    lane = self._lanes[user]
+                    while lane and lane[0].deadline <= now:
+                        # Expired; the request thread reports the timeout
+                        expired = lane.popleft()
+                        self._queued -= 1
+                        expired.event.set()
+                    if not lane:
+                        del self._lanes[user]
+                        continue
+                    heads.append(lane[0])
+
+            # SQLite transactions run without the lock, so admit() and stats()
+            # do not wait on the store
+            tried = [(waiter, *self._try(waiter.user, waiter.cost)) for waiter in heads]
+
+            with self._lock:
+                next_wait = None
+                progressed = False
+                for waiter, admitted, wait in tried:
+                    if not admitted:
+                        next_wait = wait if next_wait is None else min(next_wait, wait)
+                        continue
+                    progressed = True
+                    lane = self._lanes.get(waiter.user)
+                    if lane is None or waiter not in lane:
+                        # Gave up while the buckets were consulted; its tokens are spent
+                        continue
+                    lane.remove(waiter)
+                    self._queued -= 1
+                    waiter.admitted = True
+                    self._stats['admitted'] += 1
+                    waiter.event.set()
+                    # Served lanes go to the back of the rotation
+                    if lane:
+                        self._lanes.move_to_end(waiter.user)
+                    else:
+                        del self._lanes[waiter.user]
+
+                if self._queued and not progressed:
+                    deadline = min(lane[0].deadline for lane in self._lanes.values())
+                    timeout = max(0.0, deadline - time.monotonic())
+                    if next_wait is not None:
+                        timeout = min(timeout, next_wait)
+                    self._lock.wait(max(timeout, 0.005))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                'enabled': self.enabled,
+                'waiting': self._queued,
+                'waitingUsers': len(self._lanes),
+                'maxWait': self.max_wait,
+                'maxQueue': self.max_queue,
+            }
+
+
+admission = AdmissionController()
+
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
@@ -0,0 +1,105 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+from typing import Any, Awaitable, Dict, Optional
+
+
+class AsyncRuntime:
+    """
+    One long-lived event loop on a background thread for async model calls.
+
+    The Gemini SDK caches its async client on the loop that first used it,
+    so every coroutine that talks to the model must run on the same loop;
+    callers on other threads or loops hand their coroutines over with
+    submit() or run(). Hundreds of generations can be in flight on the
+    loop while it holds a single thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._stats = {'submitted': 0, 'completed': 0, 'failed': 0}
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name='async-runtime', daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, coro: Awaitable[Any]) -> concurrent.futures.Future:
+        """
+        Schedule a coroutine on the runtime loop from any thread. It runs in
+        a copy of the caller's context, so context variables such as the
+        active profile follow it onto the loop thread. Cancelling the
+        returned future cancels the coroutine.
+        """
+        loop = self._ensure_loop()
+        with self._lock:
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+            self._stats['submitted'] += 1
+
+        context = contextvars.copy_context()
+        future = concurrent.futures.Future()
+        future.add_done_callback(self._done)
+
+        def start() -> None:
+            if future.cancelled():
+                coro.close()
+                return
+            task = loop.create_task(coro, context=context)
+            task.add_done_callback(lambda task: self._settle(task, future))
+            future.add_done_callback(lambda f: f.cancelled() and loop.call_soon_threadsafe(task.cancel))
+
+        loop.call_soon_threadsafe(start)
+        return future
+
+    @staticmethod
+    def _settle(task: asyncio.Task, future: concurrent.futures.Future) -> None:
+        try:
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+        except concurrent.futures.InvalidStateError:
+            # The caller cancelled the future first
+            pass
+
+    def _done(self, future: concurrent.futures.Future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            failed = future.cancelled() or future.exception() is not None
+            self._stats['failed' if failed else 'completed'] += 1
+
+    async def run(self, coro: Awaitable[Any]) -> Any:
+        """Await a coroutine on the runtime loop from another event loop."""
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                'running': self._loop is not None,
+                'inFlight': self._in_flight,
+                'peakInFlight': self._peak_in_flight,
+            }
+
+
+runtime = AsyncRuntime()
@@ -0,0 +1,164 @@
+import os
+import threading
+import time
+from typing import Dict, Any, Optional
+
+DEFAULT_MODEL_NAME = 'gemini-2.5-flash'
+
+
+def _sdk():
+    """
+    Import the Gemini SDK on first use. It pulls in protobuf and grpc and
+    takes about half a second, which would otherwise delay every worker boot.
+    """
+    import google.generativeai as genai
+    return genai
+
+
+class GeminiClientPool:
+    """
+    Process-wide registry for the Gemini SDK.
+    The SDK is configured once, and one GenerativeModel is kept per model name.
+    Every model shares the SDK's default generative client, so the underlying
+    channel (and its TLS session) is reused across requests and threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._configured = False
+        self._api_key: Optional[str] = None
+        self._default_model_name = DEFAULT_MODEL_NAME
+        self._models: Dict[str, Any] = {}
+        self._client_ids = set()
+        self._stats = {
+            'configureCalls': 0,
+            'modelsCreated': 0,
+            'modelRequests': 0,
+            'modelReuses': 0,
+            'warmups': 0,
+            'warmupErrors': 0,
+        }
+        self._warmed_up_at: Optional[float] = None
+
+    def configure(self, api_key: Optional[str] = None, model_name: Optional[str] = None,
+                  transport: Optional[str] = None) -> None:
+        """
+        Configure the SDK. Only the first call has an effect unless the
+        API key changes, because re-configuring drops the cached client.
+        """
+        api_key = api_key or os.getenv('GEMINI_API_KEY')
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY not found in environment variables")
+
+        with self._lock:
+            if self._configured and api_key == self._api_key:
+                return
+
+            options = {'api_key': api_key}
+            transport = transport or os.getenv('GEMINI_TRANSPORT')
+            if transport:
+                options['transport'] = transport
+
+            _sdk().configure(**options)
+            self._api_key = api_key
+            self._default_model_name = model_name or os.getenv('GEMINI_MODEL', DEFAULT_MODEL_NAME)
+            self._models = {}
+            self._client_ids = set()
+            self._configured = True
+            self._stats['configureCalls'] += 1
+
+    def get_model(self, model_name: Optional[str] = None):
+        """Return the shared GenerativeModel, configuring the SDK on first use."""
+        if not self._configured:
+            self.configure()
+
+        name = model_name or self._default_model_name
+        with self._lock:
+            self._stats['modelRequests'] += 1
+            model = self._models.get(name)
+            if model is None:
+                model = _sdk().GenerativeModel(name)
+                self._models[name] = model
+                self._stats['modelsCreated'] += 1
+            else:
+                self._stats['modelReuses'] += 1
+            return model
+
+    def record_call(self, model) -> None:
+        """Remember which transport client served a call, to prove it is reused."""
+        client = getattr(model, '_client', None)
+        if client is not None:
+            with self._lock:
+                self._client_ids.add(id(client))
+
+    def warm_up(self, model_name: Optional[str] = None) -> bool:
+        """
+        Open the connection ahead of the first real request.
+        count_tokens is cheap and goes through the same client as generate_content.
+        """
+        try:
+            model = self.get_model(model_name)
+            model.count_tokens('ping')
+            self.record_call(model)
+            with self._lock:
+                self._stats['warmups'] += 1
+                self._warmed_up_at = time.time()
+            return True
+        except Exception as e:
+            print(f"Gemini warm-up failed: {e}")
+            with self._lock:
+                self._stats['warmupErrors'] += 1
+            return False
+
+    def prepare(self, warm_up: bool = False) -> None:
+        """Import the SDK and build the default model ahead of the first request."""
+        try:
+            self.get_model()
+        except Exception as e:
+            print(f"Gemini client could not be prepared: {e}")
+            return
+        if warm_up:
+            self.warm_up()
+
+    def ready(self) -> bool:
+        """True once the SDK is configured and the default model exists."""
+        with self._lock:
+            return self._configured and self._default_model_name in self._models
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                'configured': self._configured,
+                'ready': self._configured and self._default_model_name in self._models,
+                'defaultModel': self._default_model_name,
+                'models': sorted(self._models),
+                'distinctClients': len(self._client_ids),
+                'warmedUpAt': self._warmed_up_at,
+            }
+
+
+pool = GeminiClientPool()
+
+
+def init_gemini(warm_up: Optional[bool] = None, preload: Optional[bool] = None) -> None:
+    """
+    Prepare the shared pool at app startup without delaying boot: the SDK is
+    imported, configured and optionally warmed up in a background thread.
+    With GEMINI_PRELOAD=0 that happens on the first model call instead.
+    """
+    if not os.getenv('GEMINI_API_KEY'):
+        # Requests will fall back to mock data; keep the app bootable.
+        print("Gemini not configured: GEMINI_API_KEY not found in environment variables")
+        return
+
+    if preload is None:
+        preload = os.getenv('GEMINI_PRELOAD', '1').lower() not in ('0', 'false', 'no')
+    if warm_up is None:
+        warm_up = os.getenv('GEMINI_WARMUP', '0').lower() in ('1', 'true', 'yes')
+    if preload or warm_up:
+        threading.Thread(target=pool.prepare, args=(warm_up,), name='gemini-init', daemon=True).start()
+
+
+def get_model(model_name: Optional[str] = None):
+    return pool.get_model(model_name)
@@ -1,74 +1,470 @@
 import os
-import google.generativeai as genai
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+import asyncio
+import contextvars
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from services.gemini_client import pool
+from services.task_cache import cache, make_key
+from services.json_stream import QuestionStreamParser
+from services.question_pool import question_pool
+from services.resilience import breaker, guard, record_fallback, BreakerOpenError, BudgetExceededError
+from services.near_duplicates import NearDuplicateIndex
+from services.metrics import gemini_call_duration, task_parse_failures
+from services.profiling import span
 
-def generate_task(topic: str, level: str, num_questions: int) -> Dict[str, Any]:
+# Requests above SHARD_SIZE questions are split into concurrent shards.
+# The executor is shared, so SHARD_PARALLELISM bounds model calls process-wide.
+SHARD_SIZE = int(os.getenv('TASK_SHARD_SIZE', 10))
+SHARD_PARALLELISM = int(os.getenv('TASK_SHARD_PARALLELISM', 4))
+_shard_executor = ThreadPoolExecutor(max_workers=SHARD_PARALLELISM, thread_name_prefix='task-shard')
+# The async path's counterpart, created on the runtime loop at first use
+_shard_semaphore: Optional[asyncio.Semaphore] = None
+
+def generate_task(topic: str, level: str, num_questions: int,
+                  use_cache: bool = True, refresh: bool = False, fallback: bool = True) -> Dict[str, Any]:
     """
     Generate a task with questions and answers using Gemini AI.
-    Falls back to mock data if Gemini fails.
+    Results are cached per normalized (topic, level, num_questions).
+    refresh skips the cache lookup but stores the new result; use_cache=False
+    bypasses the cache entirely. Falls back to mock data if Gemini fails,
+    or raises with fallback=False.
+    """
+    task_data, _ = generate_task_with_status(topic, level, num_questions, use_cache, refresh, fallback)
+    return task_data
+
+def generate_task_with_status(topic: str, level: str, num_questions: int, use_cache: bool = True,
+                              refresh: bool = False, fallback: bool = True) -> Tuple[Dict[str, Any], bool]:
     """
+    generate_task, returning (task_data, complete). complete is False when
+    the task is mock data or some of its shards were filled with mock
+    questions.
+    """
+    key = make_key(topic, level, num_questions)
+    task_data = _prepared_task(key, topic, level, num_questions, use_cache, refresh)
+    if task_data is not None:
+        return task_data, True
+
     try:
-        # Configure Gemini
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
-
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.5-flash')
-
-        # Create prompt
-        prompt = f"""
-        Generate a Japanese language learning task for {level} level students.
-        Topic: {topic}
-        Number of questions: {num_questions}
-
-        Create {num_questions} multiple-choice or fill-in-the-blank questions related to the topic.
-        Each question should have:
-        - A unique ID (starting from 1)
-        - The question text
-        - The correct answer
-
-        Format the response as JSON:
-        {{
-            "taskId": 1,
-            "title": "Task Title",
-            "questions": [
-                {{
-                    "id": 1,
-                    "question": "Question text here?",
-                    "answer": "Correct answer here"
-                }},
-                ...
-            ]
-        }}
-
-        Make sure the questions are appropriate for {level} level and relevant to {topic}.
-        """
-
-        # Generate content
-        response = model.generate_content(prompt)
-        result_text = response.text.strip()
+        with span('generate'):
+            if num_questions > SHARD_SIZE:
+                task_data, complete = generate_sharded_task(topic, level, num_questions)
+            else:
+                task_data, complete = generate_task_from_model(topic, level, num_questions), True
+    except Exception as e:
+        if not fallback:
+            raise
+        return _fallback_task(e, topic, level, num_questions), False
+
+    _store_task(key, task_data, complete, use_cache)
+    return task_data, complete
+
+async def generate_task_async(topic: str, level: str, num_questions: int,
+                              use_cache: bool = True, refresh: bool = False) -> Dict[str, Any]:
+    """
+    generate_task on the async Gemini client. Must run on the shared
+    runtime loop (services.async_runtime), where the SDK keeps its client.
+    Cache and pool access is SQLite I/O and runs in the default executor,
+    so it never blocks the loop.
+    """
+    key = make_key(topic, level, num_questions)
+    task_data = await asyncio.to_thread(_prepared_task, key, topic, level, num_questions, use_cache, refresh)
+    if task_data is not None:
+        return task_data
+
+    try:
+        with span('generate'):
+            if num_questions > SHARD_SIZE:
+                task_data, complete = await generate_sharded_task_async(topic, level, num_questions)
+            else:
+                task_data, complete = await generate_task_from_model_async(topic, level, num_questions), True
+    except Exception as e:
+        return _fallback_task(e, topic, level, num_questions)
+
+    await asyncio.to_thread(_store_task, key, task_data, complete, use_cache)
+    return task_data
+
+def _prepared_task(key: str, topic: str, level: str, num_questions: int,
+                   use_cache: bool, refresh: bool) -> Optional[Dict[str, Any]]:
+    """The cached or pre-generated task for a request, or None if the model is needed."""
+    if use_cache and not refresh:
+        with span('cache_lookup'):
+            cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    # refresh and noCache ask for a fresh generation, which the pool is not
+    if refresh or not use_cache:
+        return None
+
+    # Serve pre-generated questions when the pool has enough of them
+    with span('pool_take'):
+        pooled = question_pool.take(topic, level, num_questions)
+    if pooled is None:
+        return None
+
+    title, questions = pooled
+    for i, question in enumerate(questions, start=1):
+        question['id'] = i
+    task_data = {
+        'taskId': 1,
+        'title': title or f"Japanese Language Task: {topic} ({level})",
+        'questions': questions
+    }
+    if use_cache:
+        cache.set(key, task_data)
+    return task_data
+
+def _fallback_task(error: Exception, topic: str, level: str, num_questions: int) -> Dict[str, Any]:
+    print(f"Gemini API error: {error}")
+    print(f"API Key present: {bool(os.getenv('GEMINI_API_KEY'))}")
+    # Fallback to mock data, which is never cached
+    record_fallback(error)
+    return generate_mock_task(topic, level, num_questions)
+
+def _store_task(key: str, task_data: Dict[str, Any], complete: bool, use_cache: bool) -> None:
+    # Tasks with mock-filled shards are served but not cached
+    if use_cache and complete:
+        with span('cache_store'):
+            cache.set(key, task_data)
+
+def start_question_pool() -> None:
+    """
+    Start the background question pool when TASK_POOL_ENABLED is set.
+    TASK_POOL_TOPICS lists the topics to pre-fill for every level.
+    """
+    if os.getenv('TASK_POOL_ENABLED', '0').lower() not in ('1', 'true', 'yes'):
+        return
+    topics = [t.strip() for t in os.getenv('TASK_POOL_TOPICS', 'japan').split(',') if t.strip()]
+    question_pool.start(generate_task_from_model, topics)
+
+def _shard_sizes(num_questions: int) -> List[int]:
+    shard_count = -(-num_questions // SHARD_SIZE)
+    return [num_questions // shard_count + (1 if i < num_questions % shard_count else 0)
+            for i in range(shard_count)]
+
+def generate_sharded_task(topic: str, level: str, num_questions: int) -> Tuple[Dict[str, Any], bool]:
+    """
+    Generate a large task as concurrent shards of at most SHARD_SIZE questions.
+    Questions duplicated across shards are dropped and ids are renumbered.
+    A failed shard is filled with mock questions; if every shard fails the
+    error is raised so the caller falls back for the whole task.
+    Returns (task_data, complete) where complete is False if any shard fell back.
+    """
+    sizes = _shard_sizes(num_questions)
+    # Each shard runs in a copy of the caller's context, which carries the active profile
+    futures = [
+        _shard_executor.submit(contextvars.copy_context().run, generate_task_from_model,
+                               topic, level, size, (i + 1, len(sizes)))
+        for i, size in enumerate(sizes)
+    ]
+
+    shards = []
+    for future in futures:
+        try:
+            shards.append(future.result())
+        except Exception as e:
+            shards.append(e)
+    return _merge_shards(topic, level, sizes, shards)
+
+async def generate_sharded_task_async(topic: str, level: str, num_questions: int) -> Tuple[Dict[str, Any], bool]:
+    """generate_sharded_task with the shards as concurrent coroutines."""
+    global _shard_semaphore
+    if _shard_semaphore is None:
+        _shard_semaphore = asyncio.Semaphore(SHARD_PARALLELISM)
+
+    async def shard(size: int, part: Tuple[int, int]) -> Dict[str, Any]:
+        async with _shard_semaphore:
+            return await generate_task_from_model_async(topic, level, size, part)
+
+    sizes = _shard_sizes(num_questions)
+    shards = await asyncio.gather(
+        *(shard(size, (i + 1, len(sizes))) for i, size in enumerate(sizes)),
+        return_exceptions=True
+    )
+    return _merge_shards(topic, level, sizes, list(shards))
+
+def _merge_shards(topic: str, level: str, sizes: List[int], shards: List[Any]) -> Tuple[Dict[str, Any], bool]:
+    # shards holds each shard's task data, or the exception it failed with.
+    # The result is complete only if every question came from the model.
+    header = None
+    questions = []
+    duplicates = NearDuplicateIndex()
+    failures = [shard for shard in shards if isinstance(shard, BaseException)]
+    if len(failures) == len(sizes):
+        for error in failures:
+            print(f"Gemini shard error: {error}")
+            record_fallback(error)
+        raise failures[-1]
+
+    for shard in shards:
+        if isinstance(shard, BaseException):
+            continue
+        header = header or shard
+        for question in shard['questions']:
+            # Shards do not see each other, so drop questions another shard already asked
+            text = str(question.get('question', ''))
+            if duplicates.query(text):
+                continue
+            duplicates.add(len(questions), text)
+            questions.append(question)
+
+    total = sum(sizes)
+    complete = not failures and len(questions) >= total
+    for error in failures:
+        print(f"Gemini shard error: {error}")
+        record_fallback(error)
+
+    if len(questions) < total:
+        # Fill failed shards and questions lost to deduplication with mock
+        # questions, skipping any that repeat a model question
+        fill = []
+        for question in generate_mock_task(topic, level, total)['questions']:
+            if len(questions) + len(fill) == total:
+                break
+            if not duplicates.query(str(question.get('question', ''))):
+                fill.append(question)
+        questions.extend(fill)
+
+    for i, question in enumerate(questions, start=1):
+        question['id'] = i
+
+    return {
+        'taskId': header['taskId'],
+        'title': header['title'],
+        'questions': questions
+    }, complete
 
-        # Try to parse JSON
-        if result_text.startswith('```json'):
-            result_text = result_text[7:-3].strip()
-        elif result_text.startswith('```'):
-            result_text = result_text[3:-3].strip()
+def build_task_prompt(topic: str, level: str, num_questions: int,
+                      part: Optional[Tuple[int, int]] = None) -> str:
+    """
+    Build the task generation prompt.
+    part=(index, total) marks one shard of a larger task.
+    """
+    shard_note = ''
+    if part:
+        shard_note = (f"This is part {part[0]} of {part[1]} of a larger task. "
+                      f"Cover aspects of the topic that the other parts are unlikely to repeat.")
+
+    return f"""
+    Generate a Japanese language learning task for {level} level students.
+    Topic: {topic}
+    Number of questions: {num_questions}
 
+    Create {num_questions} multiple-choice or fill-in-the-blank questions related to the topic.
+    Each question should have:
+    - A unique ID (starting from 1)
+    - The question text
+    - The correct answer
+
+    Format the response as JSON:
+    {{
+        "taskId": 1,
+        "title": "Task Title",
+        "questions": [
+            {{
+                "id": 1,
+                "question": "Question text here?",
+                "answer": "Correct answer here"
+            }},
+            ...
+        ]
+    }}
+
+    Make sure the questions are appropriate for {level} level and relevant to {topic}.
+    {shard_note}
+    """
+
+def parse_task_response(result_text: str) -> Dict[str, Any]:
+    """
+    Parse the model's text into task data, stripping code fences.
+    """
+    result_text = result_text.strip()
+
+    # Try to parse JSON
+    if result_text.startswith('```json'):
+        result_text = result_text[7:-3].strip()
+    elif result_text.startswith('```'):
+        result_text = result_text[3:-3].strip()
+
+    try:
         task_data = json.loads(result_text)
+    except ValueError:
+        task_parse_failures.inc(reason='json')
+        raise
 
-        # Validate structure
-        if not all(key in task_data for key in ['taskId', 'title', 'questions']):
-            raise ValueError("Invalid response structure")
+    # Validate structure
+    if not isinstance(task_data, dict) or not all(key in task_data for key in ['taskId', 'title', 'questions']):
+        task_parse_failures.inc(reason='structure')
+        raise ValueError("Invalid response structure")
 
-        return task_data
+    return task_data
+
+def generate_task_from_model(topic: str, level: str, num_questions: int,
+                             part: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
+    """
+    Generate a task with Gemini AI.
+    Raises on any model or parsing error instead of falling back.
+    """
+    with span('build_prompt'):
+        prompt = build_task_prompt(topic, level, num_questions, part)
+    with span('model_call'):
+        text = call_model(prompt)
+    with span('parse'):
+        return parse_task_response(text)
+
+def call_model(prompt: str) -> str:
+    """
+    Call Gemini under the circuit breaker and latency budget.
+    Raises BreakerOpenError without calling the model while the breaker is
+    open, and BudgetExceededError when the call overruns GEMINI_TIMEOUT.
+    """
+    if not breaker.allow():
+        raise BreakerOpenError("Gemini circuit breaker is open")
 
+    def attempt() -> str:
+        response = model.generate_content(prompt)
+        pool.record_call(model)
+        return response.text
+
+    started = time.perf_counter()
+    try:
+        # Shared model; the SDK is configured once per process
+        model = pool.get_model()
+        text = guard.call(attempt)
+    except Exception:
+        gemini_call_duration.observe(time.perf_counter() - started, mode='blocking', outcome='error')
+        breaker.record(False)
+        raise
+    gemini_call_duration.observe(time.perf_counter() - started, mode='blocking', outcome='success')
+    breaker.record(True)
+    return text
+
+async def generate_task_from_model_async(topic: str, level: str, num_questions: int,
+                                         part: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
+    """generate_task_from_model on the async Gemini client."""
+    with span('build_prompt'):
+        prompt = build_task_prompt(topic, level, num_questions, part)
+    with span('model_call'):
+        text = await call_model_async(prompt)
+    with span('parse'):
+        return parse_task_response(text)
+
+async def call_model_async(prompt: str) -> str:
+    """
+    call_model for the async client: same breaker and GEMINI_TIMEOUT budget,
+    but the wait costs no thread. Calls are not hedged.
+    """
+    if not breaker.allow():
+        raise BreakerOpenError("Gemini circuit breaker is open")
+
+    started = time.perf_counter()
+    try:
+        model = pool.get_model()
+        response = await asyncio.wait_for(model.generate_content_async(prompt), guard.budget)
+        pool.record_call(model)
+        text = response.text
+    except asyncio.TimeoutError:
+        gemini_call_duration.observe(time.perf_counter() - started, mode='async', outcome='error')
+        breaker.record(False)
+        raise BudgetExceededError(f"Gemini call exceeded {guard.budget}s")
+    except Exception:
+        gemini_call_duration.observe(time.perf_counter() - started, mode='async', outcome='error')
+        breaker.record(False)
+        raise
+    gemini_call_duration.observe(time.perf_counter() - started, mode='async', outcome='success')
+    breaker.record(True)
+    return text
+
+def stream_task(topic: str, level: str, num_questions: int,
+                use_cache: bool = True, refresh: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Generate a task and yield it as a sequence of events:
+    {"event": "task", "data": {taskId, title}}, one {"event": "question"} per
+    question as soon as the model has finished writing it, then
+    {"event": "done", "data": {...}}. A failure before the first question
+    streams mock data instead; a failure after it ends with an "error" event.
+    """
+    key = make_key(topic, level, num_questions)
+    if use_cache and not refresh:
+        cached = cache.get(key)
+        if cached is not None:
+            yield from _task_events(cached, 'cache')
+            return
+
+    parser = QuestionStreamParser()
+    header_sent = False
+    emitted = 0
+    prompt = build_task_prompt(topic, level, num_questions)
+    try:
+        if not breaker.allow():
+            raise BreakerOpenError("Gemini circuit breaker is open")
+
+        def open_stream():
+            response = model.generate_content(prompt, stream=True)
+            pool.record_call(model)
+            return response
+
+        # The outcome is recorded once the whole stream has arrived, under
+        # the same GEMINI_TIMEOUT budget as a blocking call
+        started = time.perf_counter()
+        try:
+            model = pool.get_model()
+            for chunk in guard.stream(open_stream):
+                for question in parser.feed(chunk.text):
+                    if not header_sent:
+                        yield {'event': 'task', 'data': _task_header(parser.header)}
+                        header_sent = True
+                    emitted += 1
+                    yield {'event': 'question', 'data': question}
+                if not header_sent and parser.header is not None:
+                    yield {'event': 'task', 'data': _task_header(parser.header)}
+                    header_sent = True
+        except GeneratorExit:
+            # The client went away; that says nothing about the model
+            breaker.release()
+            raise
+        except Exception:
+            gemini_call_duration.observe(time.perf_counter() - started, mode='stream', outcome='error')
+            breaker.record(False)
+            raise
+        gemini_call_duration.observe(time.perf_counter() - started, mode='stream', outcome='success')
+        breaker.record(True)
+
+        # Validate the complete document; this also catches questions the
+        # incremental parser could not see (e.g. a malformed "questions" key)
+        task_data = parse_task_response(parser.buffer)
     except Exception as e:
-        print(f"Gemini API error: {e}")
-        print(f"API Key present: {bool(os.getenv('GEMINI_API_KEY'))}")
-        # Fallback to mock data
-        return generate_mock_task(topic, level, num_questions)
+        print(f"Gemini streaming error: {e}")
+        if emitted == 0:
+            record_fallback(e)
+            # The model's header may already be out; the mock questions follow it
+            yield from _task_events(generate_mock_task(topic, level, num_questions), 'mock',
+                                    header=not header_sent)
+        else:
+            yield {'event': 'error', 'data': {'error': 'Generation interrupted', 'questions': emitted}}
+        return
+
+    if not header_sent:
+        yield {'event': 'task', 'data': _task_header(task_data)}
+    for question in task_data['questions'][emitted:]:
+        yield {'event': 'question', 'data': question}
+
+    if use_cache:
+        cache.set(key, task_data)
+    yield {'event': 'done', 'data': {'questions': len(task_data['questions']), 'source': 'model'}}
+
+def _task_header(task_data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    task_data = task_data or {}
+    return {'taskId': task_data.get('taskId'), 'title': task_data.get('title')}
+
+def _task_events(task_data: Dict[str, Any], source: str, header: bool = True) -> Iterator[Dict[str, Any]]:
+    if header:
+        yield {'event': 'task', 'data': _task_header(task_data)}
+    for question in task_data['questions']:
+        yield {'event': 'question', 'data': question}
+    yield {'event': 'done', 'data': {'questions': len(task_data['questions']), 'source': source}}
 
 def generate_mock_task(topic: str, level: str, num_questions: int) -> Dict[str, Any]:
     """
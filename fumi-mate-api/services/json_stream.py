@@ -0,0 +1,89 @@
+import json
+from typing import Dict, Any, Iterator, Optional
+
+
+class QuestionStreamParser:
+    """
+    Incremental parser for a streamed task response.
+    Text is fed in arbitrary chunks; each element of the top-level "questions"
+    array is yielded as soon as its closing brace arrives. Anything before the
+    first '{' (such as a ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.header: Optional[Dict[str, Any]] = None
+        self.questions_done = False
+        self._pos = 0
+        self._depth = 0
+        self._root_start = -1
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._last_key = None
+        self._last_key_start = -1
+        self._questions_depth = -1
+        self._item_start = -1
+
+    def feed(self, text: str) -> Iterator[Dict[str, Any]]:
+        """Consume a chunk and yield every question completed by it."""
+        self.buffer += text
+        buffer = self.buffer
+        i = self._pos
+        end = len(buffer)
+
+        while i < end:
+            ch = buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = buffer[self._string_start + 1:i]
+                        self._last_key_start = self._string_start
+            elif ch == '"':
+                if self._root_start >= 0:
+                    self._in_string = True
+                    self._string_start = i
+            elif ch == '{' or ch == '[':
+                if self._root_start < 0:
+                    if ch == '{':
+                        self._root_start = i
+                        self._depth = 1
+                elif (ch == '[' and self._depth == 1 and self._last_key == 'questions'
+                      and self._questions_depth < 0 and not self.questions_done):
+                    self._read_header()
+                    self._depth += 1
+                    self._questions_depth = self._depth
+                else:
+                    if ch == '{' and self._depth == self._questions_depth:
+                        self._item_start = i
+                    self._depth += 1
+            elif ch == '}' or ch == ']':
+                if self._root_start >= 0:
+                    self._depth -= 1
+                    if ch == '}' and self._depth == self._questions_depth and self._item_start >= 0:
+                        item = buffer[self._item_start:i + 1]
+                        self._item_start = -1
+                        yield json.loads(item)
+                    elif ch == ']' and self._depth == self._questions_depth - 1 and self._questions_depth > 0:
+                        self._questions_depth = -1
+                        self.questions_done = True
+            i += 1
+
+        self._pos = i
+
+    def _read_header(self) -> None:
+        """
+        Parse the fields that precede "questions" (taskId, title) by closing
+        the partial object at the start of the key.
+        """
+        prefix = self.buffer[self._root_start:self._last_key_start].rstrip().rstrip(',')
+        try:
+            self.header = json.loads(prefix + '}')
+        except ValueError:
+            self.header = {}
@@ -0,0 +1,193 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+# Seconds; covers cached responses (~1 ms) up to slow model calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                for key, value in values]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; each observation is a bisect and three additions."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [count per bucket (last is +Inf)..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block, including when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(state)) for key, state in self._values.items()]
+        lines = []
+        for key, state in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(state[-2])}')
+            lines.append(f'{self.name}_count{labels} {state[-1]}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    'http_request_duration_seconds', 'Request handling time by route and status.',
+    ('method', 'route', 'status')))
+http_requests_in_flight = registry.register(Gauge(
+    'http_requests_in_flight', 'Requests currently being handled.'))
+gemini_call_duration = registry.register(Histogram(
+    'gemini_call_duration_seconds', 'Gemini generate_content calls; streams are timed to the last chunk.',
+    ('mode', 'outcome')))
+task_mock_fallbacks = registry.register(Counter(
+    'task_mock_fallbacks_total', 'Tasks served from mock data because generation failed, by cause.',
+    ('reason',)))
+task_parse_failures = registry.register(Counter(
+    'task_parse_failures_total', 'Model responses that could not be parsed into a task.',
+    ('reason',)))
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def init_app(app) -> None:
+    """Time every request of `app` and serve the metrics on GET /metrics."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_started = time.perf_counter()
+        http_requests_in_flight.inc()
+
+    @app.after_request
+    def _record_status(response):
+        g._metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _observe(error=None):
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return
+        http_requests_in_flight.dec()
+        status = g.pop('_metrics_status', 500 if error is not None else 200)
+        # The rule pattern, not the path, so IDs do not create new series
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        http_request_duration.observe(time.perf_counter() - started,
+                                      method=request.method, route=route, status=status)
+
+    def metrics():
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    app.add_url_rule('/metrics', 'metrics', metrics, methods=['GET'])
@@ -0,0 +1,232 @@
+import cProfile
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'profiles')
+
+# A request is profiled when it sends X-Profile: <PROFILE_TOKEN> (ignored
+# while no token is configured) or is picked by PROFILE_SAMPLE_RATE (0-1).
+PROFILE_HEADER = 'X-Profile'
+
+_active: ContextVar[Optional['Profile']] = ContextVar('active_profile', default=None)
+# Names of the spans open in the current context; concurrent shards and batch
+# items each run in their own context copy, so their spans nest independently
+_open_spans: ContextVar[tuple] = ContextVar('open_spans', default=())
+
+
+class _StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def stop(self) -> None:
+        self._done.set()
+        self.join()
+
+
+class Profile:
+    """
+    cProfile, a stack sampler and named spans for one unit of work on the
+    current thread. Results are written by save().
+    """
+
+    def __init__(self, label: str, sample_interval: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.sample_interval = sample_interval
+        self.spans: List[Dict[str, Any]] = []
+        self._profiler: Optional[cProfile.Profile] = None
+        self._sampler: Optional[_StackSampler] = None
+        self._token = None
+        self._started = 0.0
+        self.duration = 0.0
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._token = _active.set(self)
+        try:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread
+            self._profiler = None
+        self._sampler = _StackSampler(threading.get_ident(), self.sample_interval)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        if self._token is not None:
+            try:
+                _active.reset(self._token)
+            except ValueError:
+                # Finished from another context (e.g. after a streamed response)
+                _active.set(None)
+            self._token = None
+        self.duration = time.perf_counter() - self._started
+
+    @contextmanager
+    def span(self, name: str):
+        names = _open_spans.get() + (name,)
+        token = _open_spans.set(names)
+        path = '/'.join(names)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            _open_spans.reset(token)
+            self.spans.append({
+                'name': path,
+                'startMs': round((started - self._started) * 1000, 3),
+                'durationMs': round((time.perf_counter() - started) * 1000, 3),
+            })
+
+    def server_timing(self) -> str:
+        """Top-level spans as a Server-Timing header value."""
+        return ', '.join(
+            f"{re.sub(r'[^A-Za-z0-9_-]', '_', span['name'])};dur={span['durationMs']}"
+            for span in self.spans if '/' not in span['name']
+        )
+
+    def save(self, directory: str) -> str:
+        """Write <name>.prof, <name>.collapsed and <name>.spans.json; returns the base path."""
+        os.makedirs(directory, exist_ok=True)
+        label = re.sub(r'[^A-Za-z0-9_.-]+', '_', self.label).strip('_') or 'profile'
+        base = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{label}-{self.id}")
+
+        if self._profiler is not None:
+            self._profiler.dump_stats(base + '.prof')
+        if self._sampler is not None:
+            # One "frame;frame;frame count" line per stack, as read by flamegraph.pl and speedscope
+            with open(base + '.collapsed', 'w', encoding='utf-8') as f:
+                for stack, count in self._sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        with open(base + '.spans.json', 'w', encoding='utf-8') as f:
+            json.dump({
+                'id': self.id,
+                'label': self.label,
+                'durationMs': round(self.duration * 1000, 3),
+                'sampleIntervalMs': self.sample_interval * 1000,
+                'spans': sorted(self.spans, key=lambda span: span['startMs']),
+            }, f, indent=2)
+        return base
+
+
+class Profiler:
+    def __init__(self, directory: Optional[str] = None, token: Optional[str] = None,
+                 sample_rate: Optional[float] = None, sample_interval: Optional[float] = None):
+        self.directory = directory or os.getenv('PROFILE_DIR', DEFAULT_PROFILE_DIR)
+        self.token = token if token is not None else os.getenv('PROFILE_TOKEN', '')
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+        self.sample_interval = sample_interval or float(os.getenv('PROFILE_SAMPLE_INTERVAL', 0.001))
+        self._lock = threading.Lock()
+        self._stats = {'profiled': 0, 'saveErrors': 0}
+
+    def wanted(self, header_value: Optional[str] = None) -> bool:
+        if header_value and self.token and hmac.compare_digest(header_value, self.token):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def begin(self, label: str) -> Profile:
+        profile = Profile(label, self.sample_interval)
+        profile.start()
+        return profile
+
+    def finish(self, profile: Profile) -> Optional[str]:
+        profile.stop()
+        try:
+            base = profile.save(self.directory)
+        except OSError as e:
+            print(f"Profile {profile.id} could not be saved: {e}")
+            with self._lock:
+                self._stats['saveErrors'] += 1
+            return None
+        with self._lock:
+            self._stats['profiled'] += 1
+        return base
+
+    @contextmanager
+    def maybe_profile(self, label: str):
+        """Profile the block when the sampling rate picks it (for work outside requests)."""
+        if _active.get() is not None or not self.wanted():
+            yield
+            return
+        profile = self.begin(label)
+        try:
+            yield
+        finally:
+            self.finish(profile)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'sampleRate': self.sample_rate, 'headerEnabled': bool(self.token)}
+
+
+profiler = Profiler()
+
+
+@contextmanager
+def span(name: str):
+    """Time a named stage of the current profile; a no-op when nothing is profiled."""
+    profile = _active.get()
+    if profile is None:
+        yield
+        return
+    with profile.span(name):
+        yield
+
+
+def init_app(app) -> None:
+    """Profile requests picked by the X-Profile header or PROFILE_SAMPLE_RATE."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_profile():
+        if profiler.wanted(request.headers.get(PROFILE_HEADER)):
+            route = request.url_rule.rule if request.url_rule is not None else request.path
+            g._profile = profiler.begin(f"{request.method} {route}")
+
+    @app.after_request
+    def _profile_headers(response):
+        profile = g.get('_profile')
+        if profile is not None:
+            response.headers['X-Profile-Id'] = profile.id
+            timing = profile.server_timing()
+            if timing:
+                response.headers['Server-Timing'] = timing
+        return response
+
+    @app.teardown_request
+    def _finish_profile(error=None):
+        profile = g.pop('_profile', None)
+        if profile is not None:
+            profiler.finish(profile)
@@ -0,0 +1,240 @@
+import os
+import json
+import sqlite3
+import threading
+from typing import Dict, List, Any, Optional, Callable, Tuple
+
+from services.near_duplicates import NearDuplicateIndex
+
+DEFAULT_POOL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'question_pool.sqlite3')
+
+# Same level keys as generate_mock_task
+LEVELS = ('beginner', 'intermediate', 'advanced')
+
+
+def pool_key(topic: str, level: str) -> str:
+    return ' '.join(topic.split()).lower() + '|' + ' '.join(level.split()).lower()
+
+
+class QuestionPool:
+    """
+    Pre-generated questions per (topic, level), filled by a background worker.
+    Requests take questions out of the pool; when a pool drops below the
+    low-water mark the worker tops it back up to `target`. The pool lives in
+    a SQLite file (WAL) shared by every worker process on the host, and a
+    take removes its questions in one transaction, so no question is handed
+    out twice.
+    """
+
+    def __init__(self, path: Optional[str] = None, target: Optional[int] = None,
+                 low_water: Optional[int] = None, batch_size: Optional[int] = None,
+                 max_keys: Optional[int] = None):
+        self.path = path or os.getenv('TASK_POOL_PATH', DEFAULT_POOL_PATH)
+        self.target = target or int(os.getenv('TASK_POOL_TARGET', 30))
+        self.low_water = low_water or int(os.getenv('TASK_POOL_LOW_WATER', 10))
+        self.batch_size = batch_size or int(os.getenv('TASK_POOL_BATCH_SIZE', 10))
+        self.max_keys = max_keys or int(os.getenv('TASK_POOL_MAX_KEYS', 64))
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._generator: Optional[Callable[[str, str, int], Dict[str, Any]]] = None
+        self._stats = {'served': 0, 'short': 0, 'refills': 0, 'refillErrors': 0, 'storeErrors': 0}
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and self._worker.is_alive()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS pool_keys ('
+                ' key TEXT PRIMARY KEY,'
+                ' topic TEXT NOT NULL,'
+                ' level TEXT NOT NULL,'
+                ' title TEXT)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS pool_questions ('
+                ' seq INTEGER PRIMARY KEY AUTOINCREMENT,'
+                ' key TEXT NOT NULL,'
+                ' question TEXT NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS pool_questions_key ON pool_questions (key, seq)')
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = fn(conn)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return result
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def start(self, generator: Callable[[str, str, int], Dict[str, Any]],
+              topics: List[str]) -> None:
+        """
+        Register the topics and start the refill worker.
+        generator(topic, level, n) must return task data or raise.
+        """
+        with self._lock:
+            if self.running:
+                return
+            self._generator = generator
+            try:
+                for topic in topics:
+                    for level in LEVELS:
+                        self._transaction(lambda conn: self._register(conn, topic, level))
+            except sqlite3.Error as e:
+                print(f"Question pool could not be opened: {e}")
+                return
+            self._worker = threading.Thread(target=self._run, name='question-pool', daemon=True)
+            self._worker.start()
+        self._wakeup.set()
+
+    def take(self, topic: str, level: str, count: int) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        Remove and return (title, questions) if the pool holds at least
+        `count` questions for this topic and level, otherwise None.
+        Either way the pool is scheduled for refill when it runs low.
+        """
+        if not self.running:
+            return None
+
+        def take_rows(conn):
+            key = self._register(conn, topic, level)
+            if key is None:
+                return None, None
+            rows = conn.execute(
+                'SELECT seq, question FROM pool_questions WHERE key = ? ORDER BY seq LIMIT ?', (key, count)
+            ).fetchall()
+            (left,) = conn.execute('SELECT COUNT(*) FROM pool_questions WHERE key = ?', (key,)).fetchone()
+            if len(rows) < count:
+                return None, left
+            conn.execute('DELETE FROM pool_questions WHERE key = ? AND seq <= ?', (key, rows[-1][0]))
+            (title,) = conn.execute('SELECT title FROM pool_keys WHERE key = ?', (key,)).fetchone()
+            return (title, [json.loads(question) for _, question in rows]), left - count
+
+        try:
+            result, left = self._transaction(take_rows)
+        except sqlite3.Error as e:
+            print(f"Question pool store error: {e}")
+            self._count('storeErrors')
+            return None
+
+        self._count('served' if result is not None else 'short')
+        if left is not None and left < self.low_water:
+            self._wakeup.set()
+        return result
+
+    def _register(self, conn, topic: str, level: str) -> Optional[str]:
+        # Runs inside a transaction; returns None once max_keys pools exist
+        key = pool_key(topic, level)
+        if conn.execute('SELECT 1 FROM pool_keys WHERE key = ?', (key,)).fetchone() is None:
+            (keys,) = conn.execute('SELECT COUNT(*) FROM pool_keys').fetchone()
+            if keys >= self.max_keys:
+                return None
+            conn.execute('INSERT INTO pool_keys (key, topic, level) VALUES (?, ?, ?)', (key, topic, level))
+        return key
+
+    def _available(self, conn) -> Dict[str, int]:
+        rows = conn.execute(
+            'SELECT k.key, COUNT(q.seq) FROM pool_keys k LEFT JOIN pool_questions q ON q.key = k.key GROUP BY k.key'
+        ).fetchall()
+        return dict(rows)
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                low = [key for key, available in self._available(self._connect()).items()
+                       if available < self.low_water]
+            except sqlite3.Error as e:
+                print(f"Question pool store error: {e}")
+                self._count('storeErrors')
+                continue
+            for key in low:
+                self._refill(key)
+
+    def _refill(self, key: str) -> None:
+        while True:
+            try:
+                conn = self._connect()
+                topic, level = conn.execute('SELECT topic, level FROM pool_keys WHERE key = ?', (key,)).fetchone()
+                (available,) = conn.execute('SELECT COUNT(*) FROM pool_questions WHERE key = ?', (key,)).fetchone()
+            except (sqlite3.Error, TypeError) as e:
+                print(f"Question pool store error: {e}")
+                self._count('storeErrors')
+                return
+            if available >= self.target:
+                return
+
+            try:
+                task_data = self._generator(topic, level, self.batch_size)
+            except Exception as e:
+                print(f"Question pool refill failed for {key}: {e}")
+                self._count('refillErrors')
+                return
+
+            def store(conn):
+                # Skip near-duplicates of pooled questions and of each other;
+                # other workers may have refilled the same pool meanwhile
+                duplicates = NearDuplicateIndex()
+                for seq, question in conn.execute('SELECT seq, question FROM pool_questions WHERE key = ?', (key,)):
+                    duplicates.add(seq, str(json.loads(question).get('question', '')))
+                fresh = 0
+                for question in task_data['questions']:
+                    text = str(question.get('question', ''))
+                    if duplicates.query(text):
+                        continue
+                    cursor = conn.execute('INSERT INTO pool_questions (key, question) VALUES (?, ?)',
+                                          (key, json.dumps(question, ensure_ascii=False)))
+                    duplicates.add(-cursor.lastrowid, text)
+                    fresh += 1
+                conn.execute('UPDATE pool_keys SET title = COALESCE(title, ?) WHERE key = ?',
+                             (task_data.get('title'), key))
+                return fresh
+
+            try:
+                fresh = self._transaction(store)
+            except sqlite3.Error as e:
+                print(f"Question pool store error: {e}")
+                self._count('storeErrors')
+                return
+            if not fresh:
+                # The model is repeating itself; try again on the next wake-up
+                return
+            self._count('refills')
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            available = self._available(self._connect())
+        except sqlite3.Error as e:
+            print(f"Question pool store error: {e}")
+            available = {}
+        with self._lock:
+            return {
+                **self._stats,
+                'running': self.running,
+                'target': self.target,
+                'lowWater': self.low_water,
+                'available': available,
+            }
+
+
+question_pool = QuestionPool()
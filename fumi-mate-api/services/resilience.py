@@ -0,0 +1,240 @@
+import os
+import queue
+import time
+import threading
+from collections import deque, Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, Optional, Callable, Iterable, Iterator, TypeVar
+
+from services.metrics import task_mock_fallbacks
+
+T = TypeVar('T')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class BreakerOpenError(Exception):
+    """Raised instead of calling the model while the breaker is open."""
+
+
+class BudgetExceededError(TimeoutError):
+    """Raised when a call does not finish within its latency budget."""
+
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker over the last `window` calls.
+    Opens when at least `min_calls` outcomes are recorded and the error rate
+    reaches `error_threshold`. After `open_seconds` one probe call is let
+    through (half-open); its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, window: Optional[int] = None, min_calls: Optional[int] = None,
+                 error_threshold: Optional[float] = None, open_seconds: Optional[float] = None):
+        self.window = window or int(os.getenv('GEMINI_BREAKER_WINDOW', 20))
+        self.min_calls = min_calls or int(os.getenv('GEMINI_BREAKER_MIN_CALLS', 5))
+        self.error_threshold = error_threshold or float(os.getenv('GEMINI_BREAKER_ERROR_RATE', 0.5))
+        self.open_seconds = open_seconds or float(os.getenv('GEMINI_BREAKER_OPEN_SECONDS', 30))
+
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=self.window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._stats = {'opened': 0, 'rejected': 0}
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._stats['rejected'] += 1
+            return False
+
+    def record(self, success: bool) -> None:
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+                if success:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if (self._state == CLOSED and len(self._outcomes) >= self.min_calls
+                    and failures / len(self._outcomes) >= self.error_threshold):
+                self._open()
+
+    def release(self) -> None:
+        """Give up an allowed call without an outcome, e.g. a stream the client closed."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    def _open(self) -> None:
+        # Caller holds the lock
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._stats['opened'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            recorded = len(self._outcomes)
+            failures = self._outcomes.count(False)
+            return {
+                **self._stats,
+                'state': self._state,
+                'recentCalls': recorded,
+                'recentErrorRate': round(failures / recorded, 4) if recorded else 0.0,
+            }
+
+
+class LatencyGuard:
+    """
+    Runs model calls under a hard latency budget with an optional hedge.
+    A call that overruns keeps its worker thread until the SDK returns, so the
+    executor size also caps how many abandoned calls can pile up.
+    """
+
+    def __init__(self, budget: Optional[float] = None, hedge_after: Optional[float] = None,
+                 max_workers: Optional[int] = None):
+        self.budget = budget or float(os.getenv('GEMINI_TIMEOUT', 20))
+        self.hedge_after = hedge_after if hedge_after is not None else float(os.getenv('GEMINI_HEDGE_AFTER', 0))
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv('GEMINI_CALL_WORKERS', 16)),
+            thread_name_prefix='gemini-call'
+        )
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """
+        Return fn()'s result, or raise BudgetExceededError after `budget`
+        seconds. With hedging on, a second attempt starts after `hedge_after`
+        seconds and whichever succeeds first wins.
+        """
+        deadline = time.monotonic() + self.budget
+        primary = self._executor.submit(fn)
+        pending = {primary}
+        hedge_at = time.monotonic() + self.hedge_after if self.hedge_after > 0 else None
+        error = None
+
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            until = deadline if hedge_at is None else min(deadline, hedge_at)
+            done, pending = wait(pending, timeout=until - now, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        self._count('hedgeWins')
+                    return future.result()
+                error = future.exception()
+
+            if pending and hedge_at is not None and time.monotonic() >= hedge_at:
+                # Only a slow call is hedged; errors are left to the breaker
+                pending.add(self._executor.submit(fn))
+                hedge_at = None
+                self._count('hedges')
+
+        if pending:
+            self._count('timeouts')
+            raise BudgetExceededError(f"Model call exceeded {self.budget:.1f}s budget")
+        raise error
+
+    def stream(self, open_stream: Callable[[], Iterable[T]]) -> Iterator[T]:
+        """
+        Yield the items of open_stream(), which is opened and read on a worker
+        thread, and raise BudgetExceededError if the whole stream has not
+        arrived within `budget` seconds. Only the model's time counts: items
+        are buffered, so a slow consumer does not run out the budget.
+        """
+        deadline = time.monotonic() + self.budget
+        items = queue.Queue()
+        end = object()
+        closed = threading.Event()
+
+        def read() -> None:
+            try:
+                for item in open_stream():
+                    if closed.is_set():
+                        return
+                    items.put((item, None))
+            except Exception as e:
+                items.put((end, e))
+                return
+            items.put((end, None))
+
+        self._executor.submit(read)
+        try:
+            while True:
+                try:
+                    item, error = items.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    self._count('timeouts')
+                    raise BudgetExceededError(f"Model stream exceeded {self.budget:.1f}s budget")
+                if item is end:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            # Stops the reader at its next chunk once the stream is abandoned
+            closed.set()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'budgetSeconds': self.budget,
+                'hedgeAfterSeconds': self.hedge_after,
+                'timeouts': self._stats['timeouts'],
+                'hedges': self._stats['hedges'],
+                'hedgeWins': self._stats['hedgeWins'],
+            }
+
+
+breaker = CircuitBreaker()
+guard = LatencyGuard()
+
+_fallback_lock = threading.Lock()
+_fallbacks = Counter()
+
+
+def record_fallback(error: Exception) -> None:
+    """Count a mock fallback by its cause."""
+    if isinstance(error, BreakerOpenError):
+        reason = 'breakerOpen'
+    elif isinstance(error, TimeoutError):
+        reason = 'timeout'
+    else:
+        reason = 'error'
+    with _fallback_lock:
+        _fallbacks[reason] += 1
+    task_mock_fallbacks.inc(reason=reason)
+
+
+def stats() -> Dict[str, Any]:
+    with _fallback_lock:
+        fallbacks = dict(_fallbacks)
+    fallbacks['total'] = sum(fallbacks.values())
+    return {
+        'breaker': breaker.stats(),
+        'latency': guard.stats(),
+        'fallbacks': fallbacks,
+    }
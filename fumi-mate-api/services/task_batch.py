@@ -0,0 +1,72 @@
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
+from services.gemini_service import generate_task_with_status, generate_mock_task
+from services.resilience import record_fallback
+
+MAX_CONCURRENCY = int(os.getenv('TASK_BATCH_MAX_CONCURRENCY', 8))
+DEFAULT_CONCURRENCY = int(os.getenv('TASK_BATCH_CONCURRENCY', 4))
+
+
+def run_batch(items: List[Dict[str, Any]], concurrency: Optional[int] = None,
+              mock: bool = False) -> Dict[str, Any]:
+    """
+    Generate many tasks with at most `concurrency` running at once.
+    Each item is either {'params': generate_task kwargs} or {'error': message}
+    for items that failed validation. mock=True uses generate_mock_task, which
+    is useful for dry runs of a batch script.
+    Results keep the input order and carry per-item timings. An item whose
+    generation failed gets mock data with 'fallback': True and 'ok': False,
+    and is left out of the timing stats; so is a sharded item with some
+    mock-filled shards, which is also marked 'partial': True.
+    """
+    concurrency = max(1, min(concurrency or DEFAULT_CONCURRENCY, MAX_CONCURRENCY))
+    started = time.perf_counter()
+
+    def run_item(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        if item.get('error'):
+            return {'index': index, 'ok': False, 'error': item['error'], 'elapsedMs': 0.0}
+
+        params = item['params']
+        item_started = time.perf_counter()
+        try:
+            if mock:
+                task = generate_mock_task(params['topic'], params['level'], params['num_questions'])
+                result = {'index': index, 'ok': True, 'task': task}
+            else:
+                task, complete = generate_task_with_status(**params, fallback=False)
+                result = {'index': index, 'ok': complete, 'task': task}
+                if not complete:
+                    # Some shards failed and were filled with mock questions
+                    result.update(fallback=True, partial=True, error='Some questions are mock data')
+        except Exception as e:
+            print(f"Batch item {index} failed: {e}")
+            record_fallback(e)
+            task = generate_mock_task(params['topic'], params['level'], params['num_questions'])
+            result = {'index': index, 'ok': False, 'fallback': True, 'error': str(e), 'task': task}
+        result['elapsedMs'] = round((time.perf_counter() - item_started) * 1000, 1)
+        return result
+
+    # Items run in copies of the caller's context, so a profiled request keeps its spans
+    contexts = [contextvars.copy_context() for _ in items]
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='task-batch') as executor:
+        results = list(executor.map(lambda context, index, item: context.run(run_item, index, item),
+                                    contexts, range(len(items)), items))
+
+    elapsed = [r['elapsedMs'] for r in results if r['ok']]
+    return {
+        'results': results,
+        'summary': {
+            'total': len(results),
+            'succeeded': sum(1 for r in results if r['ok']),
+            'failed': sum(1 for r in results if not r['ok']),
+            'fallbacks': sum(1 for r in results if r.get('fallback')),
+            'partial': sum(1 for r in results if r.get('partial')),
+            'concurrency': concurrency,
+            'totalMs': round((time.perf_counter() - started) * 1000, 1),
+            'maxItemMs': max(elapsed) if elapsed else 0.0,
+            'meanItemMs': round(sum(elapsed) / len(elapsed), 1) if elapsed else 0.0,
+        }
+    }
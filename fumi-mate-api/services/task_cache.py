@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'tasks.sqlite3')
+
+
+def make_key(topic: str, level: str, num_questions: int) -> str:
+    """
+    Normalize a generation request into a cache key.
+    Case and surrounding/repeated whitespace do not change the generated task.
+    """
+    normalized = '|'.join([
+        ' '.join(topic.split()).lower(),
+        ' '.join(level.split()).lower(),
+        str(int(num_questions)),
+    ])
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class TaskCache:
+    """
+    Two-tier cache for generated tasks.
+    The memory tier is a per-process LRU; the SQLite tier is shared by every
+    worker on the host and survives restarts. Values are stored as JSON text,
+    so every hit returns a fresh dict that callers may modify.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: Optional[float] = None,
+                 max_memory_entries: Optional[int] = None, max_disk_entries: Optional[int] = None,
+                 disk: Optional[bool] = None):
+        self.path = path or os.getenv('TASK_CACHE_PATH', DEFAULT_CACHE_PATH)
+        self.ttl = ttl if ttl is not None else float(os.getenv('TASK_CACHE_TTL', 7 * 24 * 3600))
+        self.max_memory_entries = max_memory_entries if max_memory_entries is not None else int(os.getenv('TASK_CACHE_MEMORY_ENTRIES', 256))
+        self.max_disk_entries = max_disk_entries if max_disk_entries is not None else int(os.getenv('TASK_CACHE_DISK_ENTRIES', 10000))
+
+        self._lock = threading.Lock()
+        self._memory: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._local = threading.local()
+        if disk is None:
+            disk = os.getenv('TASK_CACHE_DISK', '1').lower() not in ('0', 'false', 'no')
+        self._disk_enabled = disk
+        self._stats = {
+            'memoryHits': 0,
+            'diskHits': 0,
+            'misses': 0,
+            'stores': 0,
+            'expired': 0,
+            'memoryEvictions': 0,
+            'diskEvictions': 0,
+            'diskErrors': 0,
+        }
+
+    # SQLite tier
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS task_cache ('
+                ' key TEXT PRIMARY KEY,'
+                ' value TEXT NOT NULL,'
+                ' expires_at REAL NOT NULL,'
+                ' accessed_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS task_cache_accessed ON task_cache (accessed_at)')
+            self._local.conn = conn
+        return conn
+
+    def _disk_get(self, key: str, now: float) -> Optional[tuple]:
+        conn = self._connect()
+        row = conn.execute('SELECT value, expires_at FROM task_cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            conn.execute('DELETE FROM task_cache WHERE key = ?', (key,))
+            self._count('expired')
+            return None
+        conn.execute('UPDATE task_cache SET accessed_at = ? WHERE key = ?', (now, key))
+        return row
+
+    def _disk_set(self, key: str, value: str, expires_at: float, now: float) -> None:
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO task_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+            (key, value, expires_at, now)
+        )
+        # Evict expired rows first, then the least recently used ones over the limit
+        conn.execute('DELETE FROM task_cache WHERE expires_at <= ?', (now,))
+        (count,) = conn.execute('SELECT COUNT(*) FROM task_cache').fetchone()
+        overflow = count - self.max_disk_entries
+        if overflow > 0:
+            conn.execute(
+                'DELETE FROM task_cache WHERE key IN ('
+                ' SELECT key FROM task_cache ORDER BY accessed_at LIMIT ?)',
+                (overflow,)
+            )
+            self._count('diskEvictions', overflow)
+
+    # Memory tier
+
+    def _memory_set(self, key: str, value: str, expires_at: float) -> None:
+        with self._lock:
+            self._memory[key] = (value, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+                self._stats['memoryEvictions'] += 1
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += amount
+
+    # Public API
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self._stats['memoryHits'] += 1
+                    return json.loads(entry[0])
+                del self._memory[key]
+                self._stats['expired'] += 1
+
+        if self._disk_enabled:
+            try:
+                row = self._disk_get(key, now)
+            except sqlite3.Error as e:
+                print(f"Task cache read error: {e}")
+                self._count('diskErrors')
+                row = None
+            if row is not None:
+                self._memory_set(key, row[0], row[1])
+                self._count('diskHits')
+                return json.loads(row[0])
+
+        self._count('misses')
+        return None
+
+    def set(self, key: str, task_data: Dict[str, Any]) -> None:
+        now = time.time()
+        value = json.dumps(task_data, ensure_ascii=False)
+        expires_at = now + self.ttl
+        self._memory_set(key, value, expires_at)
+        self._count('stores')
+
+        if self._disk_enabled:
+            try:
+                self._disk_set(key, value, expires_at, now)
+            except sqlite3.Error as e:
+                print(f"Task cache write error: {e}")
+                self._count('diskErrors')
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self._disk_enabled:
+            self._connect().execute('DELETE FROM task_cache')
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memoryEntries'] = len(self._memory)
+        lookups = stats['memoryHits'] + stats['diskHits'] + stats['misses']
+        stats['hitRatio'] = round((stats['memoryHits'] + stats['diskHits']) / lookups, 4) if lookups else 0.0
+        stats['ttlSeconds'] = self.ttl
+        stats['path'] = self.path if self._disk_enabled else None
+        return stats
+
+
+cache = TaskCache()
@@ -0,0 +1,148 @@
+import asyncio
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable
+
+from services.async_runtime import runtime
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at its depth limit."""
+
+
+class TaskJobManager:
+    """
+    Runs task generation on a bounded background executor.
+    Coroutine functions run on the shared async runtime instead, so they do
+    not hold a worker while they wait on the model.
+    Jobs that are queued or running count towards max_pending; finished jobs
+    are kept for `retention` seconds so clients can collect the result.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 retention: Optional[float] = None):
+        self.max_workers = max_workers or int(os.getenv('TASK_JOB_WORKERS', 4))
+        self.max_pending = max_pending or int(os.getenv('TASK_JOB_MAX_PENDING', 32))
+        self.retention = retention if retention is not None else float(os.getenv('TASK_JOB_RETENTION', 600))
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='task-job')
+        self._cond = threading.Condition()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._pending = 0
+        self._stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0, 'expired': 0}
+
+    def submit(self, fn: Callable[..., Dict[str, Any]], *args, **kwargs) -> Dict[str, Any]:
+        """Queue fn(*args, **kwargs) and return the job snapshot. Raises QueueFullError."""
+        with self._cond:
+            self._purge_expired()
+            if self._pending >= self.max_pending:
+                self._stats['rejected'] += 1
+                raise QueueFullError(f"{self._pending} jobs pending")
+            job_id = uuid.uuid4().hex
+            job = {
+                'jobId': job_id,
+                'status': QUEUED,
+                'createdAt': time.time(),
+                'startedAt': None,
+                'finishedAt': None,
+                'result': None,
+                'error': None,
+            }
+            self._jobs[job_id] = job
+            self._pending += 1
+            self._stats['submitted'] += 1
+            snapshot = dict(job)
+
+        if asyncio.iscoroutinefunction(fn):
+            runtime.submit(self._run_async(job_id, fn, args, kwargs))
+        else:
+            self._executor.submit(self._run, job_id, fn, args, kwargs)
+        return snapshot
+
+    def _run(self, job_id: str, fn, args, kwargs) -> None:
+        self._update(job_id, status=RUNNING, startedAt=time.time())
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            print(f"Task job {job_id} failed: {e}")
+            self._finish(job_id, FAILED, error=str(e))
+        else:
+            self._finish(job_id, DONE, result=result)
+
+    async def _run_async(self, job_id: str, fn, args, kwargs) -> None:
+        self._update(job_id, status=RUNNING, startedAt=time.time())
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            print(f"Task job {job_id} failed: {e}")
+            self._finish(job_id, FAILED, error=str(e))
+        else:
+            self._finish(job_id, DONE, result=result)
+
+    def _update(self, job_id: str, **changes) -> None:
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(changes)
+                self._cond.notify_all()
+
+    def _finish(self, job_id: str, status: str, result=None, error=None) -> None:
+        with self._cond:
+            self._pending -= 1
+            self._stats['completed' if status == DONE else 'failed'] += 1
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(status=status, result=result, error=error, finishedAt=time.time())
+            self._cond.notify_all()
+
+    def _purge_expired(self) -> None:
+        # Caller holds the lock
+        cutoff = time.time() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['finishedAt'] is not None and job['finishedAt'] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+        self._stats['expired'] += len(expired)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            self._purge_expired()
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def wait(self, job_id: str, last_status: Optional[str], timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Block until the job's status differs from last_status, or timeout.
+        Returns the current snapshot, or None if the job is unknown.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None or job['status'] != last_status:
+                    return dict(job) if job is not None else None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return dict(job)
+                self._cond.wait(remaining)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                **self._stats,
+                'pending': self._pending,
+                'retained': len(self._jobs),
+                'maxPending': self.max_pending,
+                'workers': self.max_workers,
+            }
+
+
+jobs = TaskJobManager()
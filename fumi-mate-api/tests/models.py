@@ -0,0 +1,62 @@
+"""
+SQLAlchemy models with the columns the api blueprints use. The app that
+owns the real models is not part of this tree; conftest.py mounts these as
+the `models` module next to the api package.
+"""
+from datetime import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+
+db = SQLAlchemy()
+
+
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(80))
+    user_type = db.Column(db.String(20), nullable=False)
+    __mapper_args__ = {'polymorphic_on': user_type, 'polymorphic_identity': 'user'}
+
+
+class Student(User):
+    __mapper_args__ = {'polymorphic_identity': 'student'}
+
+
+class Teacher(User):
+    __mapper_args__ = {'polymorphic_identity': 'teacher'}
+
+
+class Task(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    difficulty = db.Column(db.String(10))
+    due_date = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    questions = db.relationship('Question', backref='task', order_by='Question.id')
+
+
+class Question(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=False)
+    question_text = db.Column(db.Text, nullable=False)
+    question_type = db.Column(db.String(20))
+    hint = db.Column(db.Text)
+    sample_answer = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Submission(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    content = db.Column(db.Text)
+    status = db.Column(db.String(20), default='draft')
+    ai_score = db.Column(db.Float)
+    ai_feedback = db.Column(db.Text)
+    teacher_score = db.Column(db.Float)
+    teacher_feedback = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    task = db.relationship('Task')
@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+from fumimate import ai_services, grading_worker
+from fumimate.grading_worker import GradingQueue, GRADING_FAILED
+from fumimate.models import db, Student, Task, Submission
+
+
+def submitted(content='これは作文です。'):
+    student = Student(name='student')
+    task = Task(title='Task', difficulty='N5')
+    db.session.add_all([student, task])
+    db.session.flush()
+    submission = Submission(task_id=task.id, student_id=student.id, content=content, status='submitted')
+    db.session.add(submission)
+    db.session.commit()
+    return submission.id
+
+
+def wait_for(queue, counter, timeout=5):
+    deadline = time.monotonic() + timeout
+    while queue.stats()[counter] == 0:
+        assert time.monotonic() < deadline, queue.stats()
+        time.sleep(0.01)
+
+
+def test_feedback_raises_without_fallback(monkeypatch):
+    def broken(content):
+        raise RuntimeError('model down')
+    monkeypatch.setattr(ai_services, 'analyze_text', broken)
+
+    assert ai_services.generate_ai_feedback('...')['overall_score'] == 0
+    with pytest.raises(RuntimeError):
+        ai_services.generate_ai_feedback('...', fallback=False)
+
+
+def test_exhausted_submissions_are_not_recovered(app, monkeypatch):
+    calls = []
+
+    def broken(content, difficulty='N5', fallback=True):
+        calls.append(fallback)
+        raise RuntimeError('model down')
+    monkeypatch.setattr(grading_worker, 'generate_ai_feedback', broken)
+
+    submission_id = submitted()
+    queue = GradingQueue(workers=1, max_attempts=3, retry_delay=0.01)
+    queue.start(app)
+    wait_for(queue, 'failed')
+
+    assert calls == [False, False, False]
+    assert queue.stats()['retried'] == 2
+    db.session.expire_all()
+    assert db.session.get(Submission, submission_id).status == GRADING_FAILED
+
+    restarted = GradingQueue(workers=1)
+    restarted.start(app)
+    assert restarted.stats()['recovered'] == 0
+
+
+def test_retry_grades_after_a_transient_failure(app, monkeypatch):
+    calls = []
+
+    def flaky(content, difficulty='N5', fallback=True):
+        calls.append(fallback)
+        if len(calls) == 1:
+            raise RuntimeError('timeout')
+        return {'overall_score': 80}
+    monkeypatch.setattr(grading_worker, 'generate_ai_feedback', flaky)
+
+    submission_id = submitted()
+    queue = GradingQueue(workers=1, max_attempts=3, retry_delay=0.01)
+    queue.start(app)
+    wait_for(queue, 'graded')
+
+    assert len(calls) == 2 and queue.stats()['failed'] == 0
+    db.session.expire_all()
+    submission = db.session.get(Submission, submission_id)
+    assert submission.status == grading_worker.AI_GRADED
+    assert submission.ai_score == 80
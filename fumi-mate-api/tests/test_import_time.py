@@ -0,0 +1,6 @@
+import check_import_time
+
+
+def test_boot_stays_within_import_budget():
+    _, total_ms, failures = check_import_time.check(check_import_time.DEFAULT_BUDGET_MS)
+    assert failures == [], f"{total_ms:.1f} ms: {failures}"
@@ -0,0 +1,28 @@
+import os
+
+import pytest
+
+from services.near_duplicates import NearDuplicateIndex
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VENDORED = os.path.join(os.path.dirname(ROOT), 'fumi-mate-flask-demo', 'near_duplicates.py')
+
+
+def _text(path):
+    with open(path, 'rb') as f:
+        return f.read().replace(b'\r\n', b'\n')
+
+
+@pytest.mark.skipif(not os.path.exists(VENDORED), reason='fumi-mate-flask-demo is not checked out')
+def test_demo_copy_matches():
+    assert _text(VENDORED) == _text(os.path.join(ROOT, 'services', 'near_duplicates.py'))
+
+
+def test_finds_near_duplicates_only():
+    index = NearDuplicateIndex()
+    index.add('season', 'あなたの好きな季節について書いてください。')
+    index.add('mountain', '「山」という漢字を使って、短い文を書いてください。')
+
+    matches = index.query('あなたの好きな季節について書いてください')
+    assert [key for key, _ in matches] == ['season']
+    assert index.query('日本の食べ物を説明してください。') == []
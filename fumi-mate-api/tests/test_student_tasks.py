@@ -0,0 +1,92 @@
+import pytest
+
+from fumimate.models import db, Task, Question, Submission, Student
+
+
+def seed(tasks, questions_per_task):
+    student = Student(name='student')
+    db.session.add(student)
+    db.session.flush()
+    for t in range(tasks):
+        task = Task(title=f'Task {t}', difficulty='N5')
+        task.questions = [Question(question_text=f'Q{t}.{q}') for q in range(questions_per_task)]
+        db.session.add(task)
+        db.session.flush()
+        if t % 2 == 0:
+            db.session.add(Submission(task_id=task.id, student_id=student.id, content='...', status='submitted'))
+    db.session.commit()
+    return student
+
+
+def list_tasks(client, headers, query=''):
+    response = client.get(f'/api/student/tasks{query}', headers=headers)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+@pytest.mark.parametrize('query', ['', '?limit=5', '?limit=500', '?includeQuestions=false'])
+def test_query_count_does_not_grow_with_tasks(app, auth_headers, count_queries, query):
+    counts = []
+    for tasks, questions_per_task in ((2, 1), (20, 5)):
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        student = seed(tasks, questions_per_task)
+        headers = auth_headers(student)
+        client = app.test_client()
+        # A fresh client and student each time, so the response cache is cold
+        body, count = count_queries(lambda: list_tasks(client, headers, query))
+        assert body['tasks']
+        counts.append(count)
+    assert counts[0] == counts[1]
+
+
+def test_query_count_is_the_same_for_every_page(app, auth_headers, count_queries):
+    student = seed(30, 3)
+    headers = auth_headers(student)
+    client = app.test_client()
+
+    counts = []
+    cursor = None
+    pages = 0
+    while True:
+        query = '?limit=7' + (f'&cursor={cursor}' if cursor else '')
+        body, count = count_queries(lambda: list_tasks(client, headers, query))
+        counts.append(count)
+        pages += 1
+        cursor = body['nextCursor']
+        if cursor is None:
+            break
+    assert pages == 5
+    assert len(set(counts)) == 1
+
+
+def test_full_list_without_limit_or_cursor(app, auth_headers):
+    student = seed(60, 1)
+    body = list_tasks(app.test_client(), auth_headers(student))
+    assert len(body['tasks']) == 60
+    assert 'nextCursor' not in body
+    assert [task['isDone'] for task in body['tasks'][:2]] == [True, False]
+
+
+@pytest.mark.parametrize('edit', ['task', 'question', 'new question', 'deleted question'])
+def test_editing_tasks_changes_the_etag(app, auth_headers, edit):
+    student = seed(3, 2)
+    headers = auth_headers(student)
+    client = app.test_client()
+    etag = client.get('/api/student/tasks', headers=headers).headers['ETag']
+
+    task = db.session.get(Task, 1)
+    if edit == 'task':
+        task.title = 'Renamed'
+    elif edit == 'question':
+        task.questions[0].question_text = 'Reworded'
+    elif edit == 'new question':
+        db.session.add(Question(task_id=task.id, question_text='Added'))
+    else:
+        db.session.delete(task.questions[0])
+    db.session.commit()
+
+    response = client.get('/api/student/tasks', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
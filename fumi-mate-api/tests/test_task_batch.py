@@ -0,0 +1,30 @@
+from services import gemini_service
+from services.task_batch import run_batch
+
+
+def fake_model_task(topic, level, num_questions, part=None):
+    if part is not None and part[0] == 2:
+        raise RuntimeError('shard failed')
+    offset = 100 * (part[0] if part else 0)
+    return {'taskId': 1, 'title': topic, 'questions': [
+        {'id': i, 'question': f'{topic} question number {offset + i} about something different', 'answer': 'a'}
+        for i in range(1, num_questions + 1)
+    ]}
+
+
+def item(num_questions):
+    return {'params': {'topic': 'batch', 'level': 'N5', 'num_questions': num_questions, 'use_cache': False}}
+
+
+def test_mock_filled_shards_are_not_reported_as_success(monkeypatch):
+    monkeypatch.setattr(gemini_service, 'generate_task_from_model', fake_model_task)
+
+    batch = run_batch([item(gemini_service.SHARD_SIZE * 2), item(1)])
+    sharded, single = batch['results']
+
+    assert sharded['ok'] is False
+    assert sharded['fallback'] is True and sharded['partial'] is True
+    assert len(sharded['task']['questions']) == gemini_service.SHARD_SIZE * 2
+    assert single['ok'] is True and 'fallback' not in single
+    assert batch['summary']['succeeded'] == 1
+    assert batch['summary']['partial'] == 1
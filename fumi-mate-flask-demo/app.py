@@ -1,20 +1,25 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import json
+import math
 from datetime import datetime
+from storage import open_store, iter_records
+from question_index import QuestionIndex
+from near_duplicates import NearDuplicateIndex
+from score_analytics import ScoreAnalytics, SCORE_FIELDS
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# In-memory data store
-users = {
+# Data store: in memory by default, SQLite with STORAGE_BACKEND=sqlite
+users = open_store('users', {
     'student1': {'id': 'student1', 'user_type': 'student'},
     'student2': {'id': 'student2', 'user_type': 'student'},
     'teacher1': {'id': 'teacher1', 'user_type': 'teacher'},
     'reviewer1': {'id': 'reviewer1', 'user_type': 'reviewer'},
-}
+})
 
-questions = {
+questions = open_store('questions', {
     'q1': {
         'id': 'q1',
         'question_text': '「山」という漢字を使って、短い文を書いてください。',
@@ -35,9 +40,9 @@ questions = {
         'question_text': 'あなたの家族について200字で書いてください。',
         'difficulty_level': 'N3'
     },
-}
+}, indexes=('difficulty_level',))
 
-tasks = {
+tasks = open_store('tasks', {
     'task1': {
         'id': 'task1',
         'question_id': 'q1',
@@ -56,9 +61,9 @@ tasks = {
         'teacher_id': 'teacher1',
         'deadline': '2025-01-25T23:59:59Z'
     },
-}
+}, indexes=('teacher_id',))
 
-submissions = {
+submissions = open_store('submissions', {
     'sub1': {
         'id': 'sub1',
         'task_id': 'task1',
@@ -100,39 +105,77 @@ submissions = {
         'content': '山は高いです。春はいいです。',
         'status': 0,  # draft
     },
-}
+}, indexes=('student_id', 'task_id'))
+
+# Retrieval index for /api/rag/find_question, kept current by POST /api/questions
+question_index = QuestionIndex(questions.values())
+
+# Near-duplicate detection for new and generated questions (TASK_DUPLICATE_THRESHOLD)
+duplicate_index = NearDuplicateIndex()
+for question in questions.values():
+    duplicate_index.add(question['id'], question['question_text'])
+
+# Running ai_score / teacher_score aggregates for /api/analytics/scores, fed
+# by every submission write. They live in this process, so with the SQLite
+# backend writes made by other processes are only seen after a restart.
+score_analytics = ScoreAnalytics(iter_records(submissions))
+
+MAX_PAGE_SIZE = 1000
+DEFAULT_TOP_K = 5
+MAX_TOP_K = 50
+EXPORT_BATCH_SIZE = 500
+IMPORT_BATCH_SIZE = 500
+MAX_IMPORT_LINE_BYTES = 1024 * 1024
+MAX_IMPORT_ERRORS = 100
+MAX_BULK_GRADES = 500
+
+def get_page_args():
+    """
+    Optional cursor pagination for list endpoints: ?limit=<n>&cursor=<id>.
+    Without limit the full list is returned, as before.
+    """
+    limit = request.args.get('limit', type=int)
+    if limit is not None:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+    return request.args.get('cursor'), limit
+
+def paged_response(store, cursor, limit, **filters):
+    """List records matching filters; the next page's cursor goes in X-Next-Cursor."""
+    try:
+        records, next_cursor = store.find(cursor=cursor, limit=limit, **filters)
+    except KeyError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+
+    response = jsonify(records)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 # API Endpoints
 
 @app.route('/api/submissions', methods=['GET', 'POST'])
 def handle_submissions():
     if request.method == 'GET':
-        student_id = request.args.get('student_id')
-        task_id = request.args.get('task_id')
-
-        filtered_submissions = list(submissions.values())
+        filters = {}
+        if request.args.get('student_id'):
+            filters['student_id'] = request.args['student_id']
+        if request.args.get('task_id'):
+            filters['task_id'] = request.args['task_id']
 
-        if student_id:
-            filtered_submissions = [s for s in filtered_submissions if s['student_id'] == student_id]
-        if task_id:
-            filtered_submissions = [s for s in filtered_submissions if s['task_id'] == task_id]
-
-        return jsonify(filtered_submissions)
+        cursor, limit = get_page_args()
+        return paged_response(submissions, cursor, limit, **filters)
 
     elif request.method == 'POST':
         data = request.get_json()
-        submission_id = f"sub{len(submissions) + 1}"
-
-        new_submission = {
-            'id': submission_id,
-            'task_id': data['task_id'],
-            'student_id': data['student_id'],
-            'content': data['content'],
-            'status': 1,  # submitted
-            'submission_time': datetime.utcnow().isoformat() + 'Z'
-        }
-
-        submissions[submission_id] = new_submission
+        with score_analytics.writing():
+            new_submission = submissions.create('sub', {
+                'task_id': data['task_id'],
+                'student_id': data['student_id'],
+                'content': data['content'],
+                'status': 1,  # submitted
+                'submission_time': datetime.utcnow().isoformat() + 'Z'
+            })
+            score_analytics.observe(new_submission)
         return jsonify(new_submission), 201
 
 @app.route('/api/submissions/<submission_id>', methods=['PATCH'])
@@ -141,73 +184,196 @@ def update_submission(submission_id):
         return jsonify({'error': 'Submission not found'}), 404
 
     data = request.get_json()
-    submission = submissions[submission_id]
+    for field in SCORE_FIELDS:
+        if field in data and not valid_score(data[field]):
+            return jsonify({'error': f'{field} must be a number between 0 and 100'}), 400
+    changes = {}
+
+    # AI grading results; a submission the teacher already graded keeps status 3
+    if 'ai_score' in data:
+        changes['ai_score'] = data['ai_score']
+        if submissions[submission_id].get('status', 0) < 2:
+            changes['status'] = 2  # AI graded
+
+    if 'ai_feedback' in data:
+        changes['ai_feedback'] = data['ai_feedback']
+
+    changes.update(teacher_grade_changes(data))
+
+    with score_analytics.writing():
+        submission = submissions.update_record(submission_id, changes)
+        score_analytics.observe(submission)
+    return jsonify(submission)
+
+def valid_score(value):
+    """A score is a finite number from 0 to 100; booleans do not count."""
+    return (isinstance(value, (int, float)) and not isinstance(value, bool)
+            and math.isfinite(value) and 0 <= value <= 100)
+
+def teacher_grade_changes(data):
+    """The submission fields a teacher's grade sets; a score moves it to status 3."""
+    changes = {}
 
     if 'teacher_score' in data:
-        submission['teacher_score'] = data['teacher_score']
-        submission['status'] = 3  # teacher graded
+        changes['teacher_score'] = data['teacher_score']
+        changes['status'] = 3  # teacher graded
 
     if 'teacher_feedback' in data:
-        submission['teacher_feedback'] = data['teacher_feedback']
+        changes['teacher_feedback'] = data['teacher_feedback']
+
+    return changes
+
+@app.route('/api/submissions/grade', methods=['POST'])
+def bulk_grade_submissions():
+    """
+    Teacher grading for many submissions in one request.
+    Body: {"grades": [{"submission_id", "teacher_score", "teacher_feedback"}, ...]}
+    Each valid entry is applied like PATCH /api/submissions/<id>, and all of
+    them are written in one transaction. `results` reports every entry in
+    request order; invalid ones are skipped without blocking the rest.
+    """
+    data = request.get_json()
+    grades = data.get('grades') if isinstance(data, dict) else None
+    if not isinstance(grades, list) or not grades:
+        return jsonify({'error': 'grades must be a non-empty list'}), 400
+    if len(grades) > MAX_BULK_GRADES:
+        return jsonify({'error': f'At most {MAX_BULK_GRADES} grades per request'}), 400
+
+    results = []
+    changes_by_id = {}
+    with score_analytics.writing():
+        for entry in grades:
+            submission_id = entry.get('submission_id') if isinstance(entry, dict) else None
+            if not isinstance(submission_id, str) or 'teacher_score' not in entry:
+                error = 'Missing required fields: submission_id, teacher_score'
+            elif not valid_score(entry['teacher_score']):
+                error = 'teacher_score must be a number between 0 and 100'
+            elif submission_id in changes_by_id:
+                error = 'Duplicate submission_id in this request'
+            elif submission_id not in submissions:
+                error = 'Submission not found'
+            else:
+                error = None
+            if error:
+                results.append({'submission_id': submission_id, 'ok': False, 'error': error})
+                continue
+            changes_by_id[submission_id] = teacher_grade_changes(entry)
+            results.append({'submission_id': submission_id, 'ok': True})
+
+        updated = submissions.update_many(changes_by_id) if changes_by_id else []
+        for submission in updated:
+            score_analytics.observe(submission)
+
+    updated_by_id = {submission['id']: submission for submission in updated}
+    for result in results:
+        if result['ok']:
+            result['submission'] = updated_by_id[result['submission_id']]
+
+    return jsonify({
+        'graded': len(updated),
+        'failed': len(results) - len(updated),
+        'results': results,
+    })
+
+@app.route('/api/analytics/scores', methods=['GET'])
+def score_analytics_summary():
+    """
+    ai_score and teacher_score statistics (count, sum, mean, percentiles,
+    histogram) for ?task_id=..., ?student_id=... or, without either, all
+    submissions. Repeating the parameter merges several tasks or students.
+    Served from running aggregates, so the cost does not grow with the
+    number of submissions.
+    """
+    task_ids = request.args.getlist('task_id')
+    student_ids = request.args.getlist('student_id')
+    if task_ids and student_ids:
+        return jsonify({'error': 'Filter by task_id or student_id, not both'}), 400
+
+    if task_ids:
+        scope, keys = 'task', task_ids
+    elif student_ids:
+        scope, keys = 'student', student_ids
+    else:
+        scope, keys = 'all', [None]
 
-    return jsonify(submission)
+    summary = score_analytics.summary(scope, keys)
+    return jsonify({'scope': scope, 'keys': keys if scope != 'all' else [], **summary})
 
 @app.route('/api/tasks', methods=['GET', 'POST'])
 def handle_tasks():
     if request.method == 'GET':
         teacher_id = request.args.get('teacher_id')
-        filtered_tasks = list(tasks.values())
+        filters = {'teacher_id': teacher_id} if teacher_id else {}
 
-        if teacher_id:
-            filtered_tasks = [t for t in filtered_tasks if t['teacher_id'] == teacher_id]
-
-        return jsonify(filtered_tasks)
+        cursor, limit = get_page_args()
+        return paged_response(tasks, cursor, limit, **filters)
 
     elif request.method == 'POST':
         data = request.get_json()
-        task_id = f"task{len(tasks) + 1}"
-
-        new_task = {
-            'id': task_id,
+        new_task = tasks.create('task', {
             'question_id': data['question_id'],
             'teacher_id': data['teacher_id'],
             'deadline': data['deadline']
-        }
-
-        tasks[task_id] = new_task
+        })
         return jsonify(new_task), 201
 
 @app.route('/api/questions', methods=['GET', 'POST'])
 def handle_questions():
     if request.method == 'GET':
-        return jsonify(list(questions.values()))
+        cursor, limit = get_page_args()
+        return paged_response(questions, cursor, limit)
 
     elif request.method == 'POST':
         data = request.get_json()
-        question_id = f"q{len(questions) + 1}"
 
-        new_question = {
-            'id': question_id,
+        # Opt-in, like exclude_duplicates on generate_question
+        similar = similar_questions(data['question_text']) if data.get('reject_duplicates') else None
+        if similar:
+            return jsonify({
+                'error': 'A near-duplicate question already exists',
+                'similar_questions': similar,
+            }), 409
+
+        new_question = questions.create('q', {
             'question_text': data['question_text'],
             'difficulty_level': data['difficulty_level']
-        }
-
-        questions[question_id] = new_question
+        })
+        question_index.add(new_question)
+        duplicate_index.add(new_question['id'], new_question['question_text'])
         return jsonify(new_question), 201
 
+def similar_questions(question_text):
+    return [
+        {'question_id': question_id, 'similarity': round(similarity, 3)}
+        for question_id, similarity in duplicate_index.query(question_text)
+    ]
+
 @app.route('/api/rag/find_question', methods=['POST'])
 def find_question():
     data = request.get_json()
     prompt = data.get('prompt', '')
     difficulty = data.get('difficulty', 'N5')
 
-    # Simple mock logic: return a question matching difficulty
-    matching_questions = [q for q in questions.values() if q['difficulty_level'] == difficulty]
-    if matching_questions:
-        return jsonify({'question_id': matching_questions[0]['id']})
+    try:
+        top_k = max(1, min(int(data.get('top_k', DEFAULT_TOP_K)), MAX_TOP_K))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'top_k must be an integer'}), 400
+
+    # Rank questions of the requested difficulty by BM25 against the prompt
+    results = question_index.search(prompt, difficulty, top_k)
+    if results:
+        return jsonify({
+            'question_id': results[0][0],
+            'results': [{'question_id': question_id, 'score': round(score, 4)} for question_id, score in results],
+        })
+
+    # No overlap with the prompt: fall back to a question matching difficulty
+    matching_question = questions.first(difficulty_level=difficulty)
+    if matching_question:
+        return jsonify({'question_id': matching_question['id'], 'results': []})
     else:
         # Fallback to first question
-        return jsonify({'question_id': list(questions.keys())[0]})
+        return jsonify({'question_id': questions.first()['id'], 'results': []})
 
 @app.route('/api/rag/generate_question', methods=['POST'])
 def generate_question():
@@ -223,7 +389,197 @@ def generate_question():
         }
     ]
 
-    return jsonify({'candidates': generated_questions})
+    # Flag candidates that repeat a question already in the bank, or drop them
+    # when the caller asks for exclude_duplicates
+    candidates = []
+    for candidate in generated_questions:
+        candidate['similar_questions'] = similar_questions(candidate['question_text'])
+        candidate['is_duplicate'] = bool(candidate['similar_questions'])
+        if not (candidate['is_duplicate'] and data.get('exclude_duplicates')):
+            candidates.append(candidate)
+
+    return jsonify({'candidates': candidates})
+
+# Bulk export and import
+
+# Collection -> (store, fields accepted as export filters)
+EXPORTS = {
+    'submissions': (submissions, ('student_id', 'task_id')),
+    'tasks': (tasks, ('teacher_id',)),
+    'questions': (questions, ('difficulty_level',)),
+}
+
+@app.route('/api/export/<collection>', methods=['GET'])
+def export_collection(collection):
+    """
+    Stream a collection as NDJSON, one record per line in insertion order.
+    Records are read a page at a time, so memory does not grow with the export.
+    """
+    if collection not in EXPORTS:
+        return jsonify({'error': 'Unknown collection'}), 404
+    store, filter_fields = EXPORTS[collection]
+    filters = {field: request.args[field] for field in filter_fields if request.args.get(field)}
+
+    def chunks():
+        lines = []
+        for record in iter_records(store, EXPORT_BATCH_SIZE, **filters):
+            lines.append(json.dumps(record, ensure_ascii=False))
+            if len(lines) == EXPORT_BATCH_SIZE:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+    return Response(chunks(), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': f'attachment; filename={collection}.ndjson'})
+
+def ndjson_lines(stream):
+    """
+    Yield (line number, raw line) from an upload as it is read. Lines over
+    MAX_IMPORT_LINE_BYTES are skipped and yielded as (line number, None).
+    """
+    line_no = 0
+    while True:
+        raw = stream.readline(MAX_IMPORT_LINE_BYTES + 1)
+        if not raw:
+            return
+        line_no += 1
+        if len(raw) > MAX_IMPORT_LINE_BYTES:
+            while raw and not raw.endswith(b'\n'):
+                raw = stream.readline(MAX_IMPORT_LINE_BYTES)
+            yield line_no, None
+        else:
+            yield line_no, raw
+
+class BulkImport:
+    """Validation and bookkeeping for one import request into `store`."""
+    store = None
+    prefix = ''
+
+    def __init__(self, allow_duplicates):
+        self.allow_duplicates = allow_duplicates
+
+    def validate(self, data):
+        """Returns (fields to store, None) or (None, error report)."""
+        raise NotImplementedError
+
+    def accept(self, line_no, fields):
+        """Called for each valid line before it is queued for the next batch."""
+
+    def written(self, records):
+        """Called with the records of each batch once it is stored."""
+
+class QuestionImport(BulkImport):
+    store = questions
+    prefix = 'q'
+
+    def __init__(self, allow_duplicates):
+        super().__init__(allow_duplicates)
+        # Questions validated but not yet written, so the file cannot repeat itself
+        self.pending = NearDuplicateIndex()
+
+    def validate(self, data):
+        text = data.get('question_text')
+        level = data.get('difficulty_level')
+        if not isinstance(text, str) or not text.strip() or not isinstance(level, str) or not level:
+            return None, {'error': 'Missing required fields: question_text, difficulty_level'}
+
+        if not self.allow_duplicates:
+            similar = similar_questions(text)
+            if similar:
+                return None, {'error': 'A near-duplicate question already exists', 'similar_questions': similar}
+            repeated = self.pending.query(text)
+            if repeated:
+                return None, {'error': f"Near-duplicate of line {repeated[0][0]}"}
+        return {'question_text': text, 'difficulty_level': level}, None
+
+    def accept(self, line_no, fields):
+        self.pending.add(line_no, fields['question_text'])
+
+    def written(self, records):
+        for record in records:
+            question_index.add(record)
+            duplicate_index.add(record['id'], record['question_text'])
+        self.pending = NearDuplicateIndex()
+
+class TaskImport(BulkImport):
+    store = tasks
+    prefix = 'task'
+
+    def validate(self, data):
+        if not all(data.get(field) for field in ('question_id', 'teacher_id', 'deadline')):
+            return None, {'error': 'Missing required fields: question_id, teacher_id, deadline'}
+        if data['question_id'] not in questions:
+            return None, {'error': f"Unknown question_id: {data['question_id']}"}
+        return {
+            'question_id': data['question_id'],
+            'teacher_id': data['teacher_id'],
+            'deadline': data['deadline']
+        }, None
+
+IMPORTS = {'questions': QuestionImport, 'tasks': TaskImport}
+
+@app.route('/api/import/<collection>', methods=['POST'])
+def import_collection(collection):
+    """
+    Bulk-create questions or tasks from an NDJSON body, one object per line.
+    The body is parsed as it arrives and valid lines are written in batches
+    of IMPORT_BATCH_SIZE. Invalid lines are reported by line number and
+    skipped; the rest are still imported. ?allow_duplicates=true imports
+    near-duplicate questions too.
+    """
+    if collection not in IMPORTS:
+        return jsonify({'error': 'Unknown collection'}), 404
+    importer = IMPORTS[collection](request.args.get('allow_duplicates') == 'true')
+
+    imported = 0
+    failed = 0
+    errors = []
+    batch = []
+
+    def flush():
+        records = importer.store.create_many(importer.prefix, batch)
+        importer.written(records)
+        batch.clear()
+        return len(records)
+
+    for line_no, raw in ndjson_lines(request.stream):
+        if raw is None:
+            report = {'error': f"Line exceeds {MAX_IMPORT_LINE_BYTES} bytes"}
+        elif not raw.strip():
+            continue
+        else:
+            try:
+                data = json.loads(raw)
+            except ValueError as e:
+                report = {'error': f"Invalid JSON: {e}"}
+            else:
+                if isinstance(data, dict):
+                    fields, report = importer.validate(data)
+                else:
+                    report = {'error': 'Each line must be a JSON object'}
+
+        if report is not None:
+            failed += 1
+            # Keep the report bounded; the count still covers every failure
+            if len(errors) < MAX_IMPORT_ERRORS:
+                errors.append({'line': line_no, **report})
+            continue
+
+        importer.accept(line_no, fields)
+        batch.append(fields)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            imported += flush()
+
+    if batch:
+        imported += flush()
+
+    return jsonify({
+        'imported': imported,
+        'failed': failed,
+        'errors': errors,
+        'errors_truncated': failed > len(errors),
+    })
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
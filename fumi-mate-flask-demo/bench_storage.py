@@ -0,0 +1,91 @@
+"""
+Compare the storage backends under concurrent writers.
+
+    python bench_storage.py --writers 8 --records 2000
+
+Each writer thread creates submissions through the store's create(), the
+path POST /api/submissions takes, then the readers page through one
+student's submissions. Prints throughput per backend and checks that no
+ID was handed out twice.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from storage import open_store
+
+
+def run_writers(store, writers, records):
+    ids = []
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(writers)
+
+    def write(worker):
+        created = []
+        start_barrier.wait()
+        for i in range(records):
+            record = store.create('sub', {
+                'task_id': f"task{i % 50}",
+                'student_id': f"student{worker}",
+                'content': '私は毎日学校に行きます。' * 4,
+                'status': 1,
+            })
+            created.append(record['id'])
+        with lock:
+            ids.extend(created)
+
+    threads = [threading.Thread(target=write, args=(w,)) for w in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return ids, time.perf_counter() - started
+
+
+def run_readers(store, readers, page_size):
+    pages = []
+
+    def read(worker):
+        count, cursor = 0, None
+        while True:
+            records, cursor = store.find(cursor=cursor, limit=page_size, student_id=f"student{worker}")
+            count += 1
+            if cursor is None:
+                break
+        pages.append(count)
+
+    threads = [threading.Thread(target=read, args=(r,)) for r in range(readers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(pages), time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--records', type=int, default=2000, help='records created per writer')
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--backends', default='memory,sqlite')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends.split(','):
+            store = open_store('submissions', indexes=('student_id', 'task_id'), backend=backend,
+                               path=os.path.join(tmp, f"{backend}.sqlite3"))
+            ids, write_seconds = run_writers(store, args.writers, args.records)
+            pages, read_seconds = run_readers(store, args.writers, args.page_size)
+
+            duplicates = len(ids) - len(set(ids))
+            print(f"{backend:>7}: {len(ids) / write_seconds:10.0f} writes/s, "
+                  f"{pages / read_seconds:10.0f} pages/s, "
+                  f"{len(ids)} ids, {duplicates} duplicates")
+
+
+if __name__ == '__main__':
+    main()
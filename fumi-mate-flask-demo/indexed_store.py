@@ -0,0 +1,129 @@
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class IndexedStore(dict):
+    """
+    A dict of records (id -> record) with hash indexes on selected fields.
+
+    Records keep their insertion order through a sequence number, and each
+    index maps a field value to the sorted sequence numbers of the matching
+    records. Lookups therefore cost O(matches) and pages can resume after
+    any record id (the cursor) with a binary search.
+
+    Assigning through store[id] = record keeps the indexes current. A record
+    that is mutated in place must go through update_record() if an indexed field
+    changes.
+    """
+
+    def __init__(self, records: Optional[Dict[str, Dict[str, Any]]] = None, indexes: Iterable[str] = ()):
+        super().__init__()
+        self.indexed_fields = tuple(indexes)
+        self._indexes: Dict[str, Dict[Any, List[int]]] = {field: {} for field in self.indexed_fields}
+        self._seq_by_id: Dict[str, int] = {}
+        self._id_by_seq: Dict[int, str] = {}
+        self._all: List[int] = []
+        self._next_seq = 0
+        for record_id, record in (records or {}).items():
+            self[record_id] = record
+
+    def __setitem__(self, record_id, record) -> None:
+        if record_id in self:
+            self._unindex(record_id, dict.__getitem__(self, record_id))
+            seq = self._seq_by_id[record_id]
+        else:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._seq_by_id[record_id] = seq
+            self._id_by_seq[seq] = record_id
+            self._all.append(seq)
+        dict.__setitem__(self, record_id, record)
+        self._index(seq, record)
+
+    def __delitem__(self, record_id) -> None:
+        record = dict.__getitem__(self, record_id)
+        self._unindex(record_id, record)
+        seq = self._seq_by_id.pop(record_id)
+        del self._id_by_seq[seq]
+        self._remove_seq(self._all, seq)
+        dict.__delitem__(self, record_id)
+
+    def update_record(self, record_id, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply changes to a stored record, re-indexing only fields that changed."""
+        record = dict.__getitem__(self, record_id)
+        seq = self._seq_by_id[record_id]
+        for field in self.indexed_fields:
+            if field in changes and changes[field] != record.get(field):
+                self._remove_seq(self._indexes[field].get(record.get(field), []), seq)
+        old = {field: record.get(field) for field in self.indexed_fields}
+        record.update(changes)
+        for field in self.indexed_fields:
+            if field in changes and changes[field] != old[field]:
+                self._insert_seq(self._indexes[field].setdefault(record.get(field), []), seq)
+        return record
+
+    def _index(self, seq: int, record: Dict[str, Any]) -> None:
+        for field in self.indexed_fields:
+            self._insert_seq(self._indexes[field].setdefault(record.get(field), []), seq)
+
+    def _unindex(self, record_id, record: Dict[str, Any]) -> None:
+        seq = self._seq_by_id[record_id]
+        for field in self.indexed_fields:
+            bucket = self._indexes[field].get(record.get(field))
+            if bucket is not None:
+                self._remove_seq(bucket, seq)
+
+    @staticmethod
+    def _insert_seq(bucket: List[int], seq: int) -> None:
+        # New records get the highest sequence number, so this is an append
+        if not bucket or bucket[-1] < seq:
+            bucket.append(seq)
+        else:
+            bucket.insert(bisect_left(bucket, seq), seq)
+
+    @staticmethod
+    def _remove_seq(bucket: List[int], seq: int) -> None:
+        i = bisect_left(bucket, seq)
+        if i < len(bucket) and bucket[i] == seq:
+            del bucket[i]
+
+    def find(self, cursor: Optional[str] = None, limit: Optional[int] = None,
+             **filters) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Records matching every filter (field=value), in insertion order.
+        Unindexed filter fields are checked per candidate. Returns
+        (records, next_cursor); next_cursor is None on the last page.
+        """
+        candidates = self._all
+        rest = dict(filters)
+        indexed = [field for field in filters if field in self._indexes]
+        if indexed:
+            # Walk the smallest matching bucket and check the other filters per record
+            field = min(indexed, key=lambda f: len(self._indexes[f].get(filters[f], ())))
+            candidates = self._indexes[field].get(filters[field], [])
+            del rest[field]
+
+        start = 0
+        if cursor is not None:
+            cursor_seq = self._seq_by_id.get(cursor)
+            if cursor_seq is None:
+                raise KeyError(cursor)
+            start = bisect_right(candidates, cursor_seq)
+
+        records = []
+        last_id = None
+        for i in range(start, len(candidates)):
+            record_id = self._id_by_seq[candidates[i]]
+            record = dict.__getitem__(self, record_id)
+            if rest and any(record.get(f) != v for f, v in rest.items()):
+                continue
+            if limit is not None and len(records) == limit:
+                # Another match exists, so the page ends at the last record returned
+                return records, last_id
+            records.append(record)
+            last_id = record_id
+        return records, None
+
+    def first(self, **filters) -> Optional[Dict[str, Any]]:
+        records, _ = self.find(limit=1, **filters)
+        return records[0] if records else None
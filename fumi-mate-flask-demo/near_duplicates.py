@@ -0,0 +1,161 @@
+"""
+MinHash/LSH near-duplicate detection for question texts.
+
+fumi-mate-flask-demo vendors this file as near_duplicates.py, so the demo
+can be deployed on its own. Edit this copy and copy it over; the test
+tests/test_near_duplicates.py fails while the two differ.
+"""
+import os
+import random
+import threading
+import unicodedata
+import zlib
+from functools import lru_cache
+from typing import Dict, Hashable, List, Optional, Tuple
+
+_np = False  # numpy module, None if missing, False until first needed
+
+
+def _numpy():
+    # Imported on first use so that numpy stays out of worker boot
+    global _np
+    if _np is False:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:  # numpy is optional; signatures fall back to plain Python
+            _np = None
+    return _np
+
+# Estimated Jaccard similarity of character 3-gram sets above which two
+# generated questions count as the same question
+DUPLICATE_THRESHOLD = float(os.getenv('TASK_DUPLICATE_THRESHOLD', 0.7))
+DUPLICATE_NUM_PERM = int(os.getenv('TASK_DUPLICATE_NUM_PERM', 64))
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def shingles(text: str, n: int = SHINGLE_SIZE) -> List[str]:
+    # Character n-grams; Japanese has no word boundaries to split on
+    text = ''.join(unicodedata.normalize('NFKC', text).lower().split())
+    if len(text) <= n:
+        return [text] if text else []
+    return [text[i:i + n] for i in range(len(text) - n + 1)]
+
+
+def _false_rates(threshold: float, bands: int, rows: int, steps: int = 100) -> Tuple[float, float]:
+    # Integrate the probability of missing a pair above the threshold and of
+    # proposing one below it, for similarity s and P(candidate) = 1 - (1 - s^r)^b
+    def candidate(s):
+        return 1 - (1 - s ** rows) ** bands
+    false_positive = sum(candidate(threshold * i / steps) for i in range(steps)) * threshold / steps
+    false_negative = sum(1 - candidate(threshold + (1 - threshold) * i / steps)
+                         for i in range(steps)) * (1 - threshold) / steps
+    return false_positive, false_negative
+
+
+@lru_cache(maxsize=None)
+def lsh_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """(bands, rows per band) with bands * rows <= num_perm that best separate pairs at the threshold."""
+    best = None
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        false_positive, false_negative = _false_rates(threshold, bands, rows)
+        # Missing a duplicate costs more than verifying a spurious candidate
+        error = 0.3 * false_positive + 0.7 * false_negative
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index over question texts: each text becomes a MinHash
+    signature of its character 3-grams, and only texts that share one of the
+    signature's band buckets are compared.
+    """
+
+    def __init__(self, threshold: Optional[float] = None, num_perm: Optional[int] = None, seed: int = 1):
+        self.threshold = threshold if threshold is not None else DUPLICATE_THRESHOLD
+        self.num_perm = num_perm or DUPLICATE_NUM_PERM
+        self.bands, self.rows = lsh_bands(self.threshold, self.num_perm)
+
+        # a, x < 2**32 and b < 2**32 keep a * x + b below 2**64, so the numpy
+        # path computes exactly the same hashes in uint64
+        rng = random.Random(seed)
+        self._permutations = [(rng.randrange(1, 1 << 32), rng.randrange(0, 1 << 32))
+                              for _ in range(self.num_perm)]
+        np = self._np = _numpy()
+        if np is not None:
+            self._a = np.array([a for a, _ in self._permutations], dtype=np.uint64)[:, None]
+            self._b = np.array([b for _, b in self._permutations], dtype=np.uint64)[:, None]
+        self._lock = threading.Lock()
+        self._signatures: Dict[Hashable, Tuple[int, ...]] = {}
+        self._buckets: List[Dict[Tuple[int, ...], set]] = [{} for _ in range(self.bands)]
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        hashed = {zlib.crc32(shingle.encode('utf-8')) for shingle in shingles(text)}
+        if not hashed:
+            return (_MAX_HASH,) * self.num_perm
+        np = self._np
+        if np is not None:
+            x = np.fromiter(hashed, dtype=np.uint64, count=len(hashed))
+            hashes = (self._a * x + self._b) % np.uint64(_MERSENNE_PRIME) & np.uint64(_MAX_HASH)
+            return tuple(hashes.min(axis=1).tolist())
+        return tuple(
+            min(((a * x + b) % _MERSENNE_PRIME) & _MAX_HASH for x in hashed)
+            for a, b in self._permutations
+        )
+
+    def _band_keys(self, signature: Tuple[int, ...]):
+        return [signature[band * self.rows:(band + 1) * self.rows] for band in range(self.bands)]
+
+    def add(self, key: Hashable, text: str) -> None:
+        signature = self.signature(text)
+        with self._lock:
+            if key in self._signatures:
+                self._remove(key)
+            self._signatures[key] = signature
+            for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+                buckets.setdefault(band_key, set()).add(key)
+
+    def remove(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._signatures:
+                self._remove(key)
+
+    def _remove(self, key: Hashable) -> None:
+        # Caller holds the lock
+        signature = self._signatures.pop(key)
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            bucket = buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del buckets[band_key]
+
+    def query(self, text: str, threshold: Optional[float] = None) -> List[Tuple[Hashable, float]]:
+        """
+        Indexed texts whose estimated similarity to `text` is at least
+        `threshold` (default: the index threshold), most similar first.
+        Thresholds below the index threshold lose recall.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        signature = self.signature(text)
+        with self._lock:
+            candidates = set()
+            for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+                candidates.update(buckets.get(band_key, ()))
+            matches = []
+            for key in candidates:
+                other = self._signatures[key]
+                similarity = sum(1 for x, y in zip(signature, other) if x == y) / self.num_perm
+                if similarity >= threshold:
+                    matches.append((key, similarity))
+        matches.sort(key=lambda match: -match[1])
+        return matches
+
+    def __len__(self) -> int:
+        return len(self._signatures)
@@ -0,0 +1,154 @@
+import math
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; scoring falls back to plain Python
+    np = None
+
+NGRAM = 2
+K1 = 1.2
+B = 0.75
+
+
+def ngrams(text: str, n: int = NGRAM) -> List[str]:
+    """
+    Character n-grams of a text. Japanese has no word boundaries, so
+    overlapping bigrams stand in for terms; whitespace is dropped and
+    full-/half-width forms are unified first.
+    """
+    text = ''.join(unicodedata.normalize('NFKC', text).lower().split())
+    if len(text) <= n:
+        return [text] if text else []
+    return [text[i:i + n] for i in range(len(text) - n + 1)]
+
+
+class _Partition:
+    """Inverted index over the questions of one difficulty level."""
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.lengths = array('d')
+        self.total_length = 0
+        # term -> (local doc numbers, term frequencies), appended in doc order
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        # Per-term BM25 contributions of each posting (without idf), valid
+        # until the next add changes the average length
+        self._contributions: Dict[str, Any] = {}
+
+    def add(self, question_id: str, terms: List[str]) -> None:
+        doc = len(self.ids)
+        self.ids.append(question_id)
+        self.lengths.append(len(terms))
+        self.total_length += len(terms)
+        for term, tf in Counter(terms).items():
+            entry = self.postings.get(term)
+            if entry is None:
+                entry = self.postings[term] = (array('q'), array('d'))
+            entry[0].append(doc)
+            entry[1].append(tf)
+        self._contributions.clear()
+
+    def search(self, terms: Iterable[str], k: int) -> List[Tuple[str, float]]:
+        n = len(self.ids)
+        if not n:
+            return []
+        avg_length = self.total_length / n
+        matched = []
+        for term, query_tf in Counter(terms).items():
+            entry = self.postings.get(term)
+            if entry is not None:
+                df = len(entry[0])
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                matched.append((term, entry, idf * query_tf))
+        if not matched:
+            return []
+
+        if np is not None:
+            return self._search_numpy(matched, avg_length, k)
+
+        scores: Dict[int, float] = {}
+        lengths = self.lengths
+        for _, (docs, tfs), weight in matched:
+            for doc, tf in zip(docs, tfs):
+                norm = K1 * (1 - B + B * lengths[doc] / avg_length)
+                scores[doc] = scores.get(doc, 0.0) + weight * tf * (K1 + 1) / (tf + norm)
+        top = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [(self.ids[doc], score) for doc, score in top]
+
+    def _contribution(self, term: str, avg_length: float):
+        contribution = self._contributions.get(term)
+        if contribution is None:
+            docs, tfs = self.postings[term]
+            lengths = np.frombuffer(self.lengths, dtype=np.float64)
+            tfs = np.frombuffer(tfs, dtype=np.float64)
+            norm = K1 * (1 - B + B * lengths[np.frombuffer(docs, dtype=np.int64)] / avg_length)
+            contribution = self._contributions[term] = tfs * (K1 + 1) / (tfs + norm)
+        return contribution
+
+    def _search_numpy(self, matched, avg_length: float, k: int) -> List[Tuple[str, float]]:
+        # Weight the cached per-posting contributions by idf and sum per document
+        docs = np.concatenate([np.frombuffer(entry[0], dtype=np.int64) for _, entry, _ in matched])
+        contributions = np.concatenate([self._contribution(term, avg_length) * weight
+                                        for term, _, weight in matched])
+        scores = np.bincount(docs, weights=contributions, minlength=len(self.ids))
+
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        # Best first, equal scores in insertion order
+        order = sorted(hits.tolist(), key=lambda doc: (-scores[doc], doc))
+        return [(self.ids[doc], float(scores[doc])) for doc in order]
+
+
+class QuestionIndex:
+    """
+    BM25 retrieval over question_text with one partition per difficulty
+    level, so a filtered query only touches that level's postings. Questions
+    are added incrementally; the index lives in this process and is rebuilt
+    from the store at startup.
+    """
+
+    def __init__(self, questions: Iterable[Dict[str, Any]] = ()):
+        self._lock = threading.Lock()
+        self._partitions: Dict[Any, _Partition] = {}
+        self._indexed = set()
+        for question in questions:
+            self.add(question)
+
+    def add(self, question: Dict[str, Any]) -> None:
+        terms = ngrams(question.get('question_text') or '')
+        with self._lock:
+            if question['id'] in self._indexed:
+                return
+            self._indexed.add(question['id'])
+            partition = self._partitions.get(question.get('difficulty_level'))
+            if partition is None:
+                partition = self._partitions[question.get('difficulty_level')] = _Partition()
+            partition.add(question['id'], terms)
+
+    def search(self, prompt: str, difficulty: Optional[str] = None, k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Top-k (question_id, score) pairs for a prompt, best first. With
+        difficulty=None every level is searched and the results merged.
+        """
+        terms = ngrams(prompt)
+        if not terms or k <= 0:
+            return []
+        # The lock also keeps the posting arrays from growing while numpy views them
+        with self._lock:
+            if difficulty is not None:
+                partition = self._partitions.get(difficulty)
+                return partition.search(terms, k) if partition else []
+            results = []
+            for partition in self._partitions.values():
+                results.extend(partition.search(terms, k))
+        results.sort(key=lambda item: -item[1])
+        return results[:k]
+
+    def __len__(self) -> int:
+        return len(self._indexed)
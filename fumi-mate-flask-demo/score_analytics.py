@@ -0,0 +1,190 @@
+import math
+import os
+import threading
+from bisect import bisect_right
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SCORE_FIELDS = ('ai_score', 'teacher_score')
+
+# Quantiles are within this relative error of the true value
+SKETCH_ACCURACY = float(os.getenv('SCORE_SKETCH_ACCURACY', 0.01))
+# Histogram bins [0, 10), [10, 20), ... [90, 100]; scores outside go to the end bins
+HISTOGRAM_EDGES = tuple(range(0, 101, 10))
+REPORTED_QUANTILES = (0.25, 0.5, 0.75, 0.9)
+
+
+class QuantileSketch:
+    """
+    Relative-error quantile sketch (DDSketch). A positive value v goes to the
+    bucket i with gamma^(i-1) < v <= gamma^i, so every quantile is within
+    `accuracy` of the true value, and scores from 1 to 100 need about 230
+    buckets at 1%. Counts can be decremented to remove a value again (a score
+    that is re-graded), and sketches with the same accuracy merge by adding
+    their counts.
+    """
+
+    def __init__(self, accuracy: Optional[float] = None):
+        self.accuracy = accuracy or SKETCH_ACCURACY
+        self.gamma = (1 + self.accuracy) / (1 - self.accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        # Values <= 0; scores are never negative
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float, count: int = 1) -> None:
+        self.count += count
+        if value <= 0:
+            self.zero_count += count
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        remaining = self.buckets.get(key, 0) + count
+        if remaining:
+            self.buckets[key] = remaining
+        else:
+            del self.buckets[key]
+
+    def remove(self, value: float) -> None:
+        self.add(value, -1)
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        if other.gamma != self.gamma:
+            raise ValueError('Only sketches with the same accuracy can be merged')
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # The bucket's midpoint in relative terms
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class ScoreAggregate:
+    """Count, sum, quantile sketch and histogram of one score field."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.sketch = QuantileSketch()
+        self.histogram = [0] * (len(HISTOGRAM_EDGES) - 1)
+
+    def _bin(self, value: float) -> int:
+        return min(max(bisect_right(HISTOGRAM_EDGES, value) - 1, 0), len(self.histogram) - 1)
+
+    def add(self, value: float, count: int = 1) -> None:
+        self.count += count
+        self.total += value * count
+        self.sketch.add(value, count)
+        self.histogram[self._bin(value)] += count
+
+    def remove(self, value: float) -> None:
+        self.add(value, -1)
+
+    def merge(self, other: 'ScoreAggregate') -> None:
+        self.count += other.count
+        self.total += other.total
+        self.sketch.merge(other.sketch)
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'sum': round(self.total, 3),
+            'mean': round(self.total / self.count, 2) if self.count else None,
+            'percentiles': {
+                f"p{round(q * 100)}": None if self.count == 0 else round(self.sketch.quantile(q), 2)
+                for q in REPORTED_QUANTILES
+            },
+            'histogram': [
+                {'min': low, 'max': high, 'count': count}
+                for low, high, count in zip(HISTOGRAM_EDGES, HISTOGRAM_EDGES[1:], self.histogram)
+            ],
+        }
+
+
+def _score(value) -> Optional[float]:
+    # Infinite scores would poison the sums and the sketch; treat them as missing
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        return None
+    return float(value)
+
+
+class ScoreAnalytics:
+    """
+    Running score aggregates per task, per student and overall, kept up to
+    date as submissions change, so a dashboard query costs the same however
+    many submissions there are.
+
+    observe() is given every submission after it is created or graded and
+    applies the difference to what it saw last for that submission. Callers
+    hold writing() around the store write and observe(), so concurrent
+    updates are applied in the order they were stored.
+    """
+
+    def __init__(self, submissions: Iterable[Dict[str, Any]] = ()):
+        self._lock = threading.RLock()
+        # (scope, key) -> field -> aggregate; scope is 'task', 'student' or 'all'
+        self._aggregates: Dict[Tuple[str, Optional[str]], Dict[str, ScoreAggregate]] = {}
+        # submission id -> its scores when last observed, in SCORE_FIELDS order
+        self._seen: Dict[str, Tuple[Optional[float], ...]] = {}
+        for submission in submissions:
+            self.observe(submission)
+
+    @contextmanager
+    def writing(self):
+        with self._lock:
+            yield
+
+    def _scopes(self, task_id, student_id) -> List[Dict[str, ScoreAggregate]]:
+        scopes = []
+        for scope in (('all', None), ('task', task_id), ('student', student_id)):
+            aggregates = self._aggregates.get(scope)
+            if aggregates is None:
+                aggregates = self._aggregates[scope] = {field: ScoreAggregate() for field in SCORE_FIELDS}
+            scopes.append(aggregates)
+        return scopes
+
+    def observe(self, submission: Dict[str, Any]) -> None:
+        """Account for the submission's current scores; its task and student never change."""
+        scores = tuple(_score(submission.get(field)) for field in SCORE_FIELDS)
+        with self._lock:
+            previous = self._seen.get(submission['id'], (None,) * len(SCORE_FIELDS))
+            self._seen[submission['id']] = scores
+            if previous == scores:
+                return
+            scopes = self._scopes(submission.get('task_id'), submission.get('student_id'))
+            for field, old, new in zip(SCORE_FIELDS, previous, scores):
+                if old == new:
+                    continue
+                for aggregates in scopes:
+                    if old is not None:
+                        aggregates[field].remove(old)
+                    if new is not None:
+                        aggregates[field].add(new)
+
+    def summary(self, scope: str, keys: Iterable[Optional[str]] = (None,)) -> Dict[str, Any]:
+        """
+        Aggregates for one or more keys of a scope, merged. Costs one merge per
+        key, independent of the number of submissions.
+        """
+        merged = {field: ScoreAggregate() for field in SCORE_FIELDS}
+        with self._lock:
+            for key in keys:
+                aggregates = self._aggregates.get((scope, key))
+                if aggregates is None:
+                    continue
+                for field in SCORE_FIELDS:
+                    merged[field].merge(aggregates[field])
+        return {field: aggregate.summary() for field, aggregate in merged.items()}
@@ -0,0 +1,294 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from indexed_store import IndexedStore
+
+# STORAGE_BACKEND=memory (default) keeps everything in process; sqlite persists
+# to STORAGE_PATH and is safe to share between threads and processes.
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'memory')
+STORAGE_PATH = os.getenv('STORAGE_PATH', os.path.join('data', 'demo.sqlite3'))
+
+
+class MemoryStore(IndexedStore):
+    """
+    The in-memory backend: an IndexedStore whose writes are serialized by a
+    lock, with an ID counter so concurrent creates never reuse an ID.
+    """
+
+    def __init__(self, name: str, records: Optional[Dict[str, Dict[str, Any]]] = None,
+                 indexes: Iterable[str] = ()):
+        self.name = name
+        self._lock = threading.RLock()
+        super().__init__(records, indexes)
+        self._counter = len(self)
+
+    def __setitem__(self, record_id, record) -> None:
+        with self._lock:
+            super().__setitem__(record_id, record)
+
+    def __delitem__(self, record_id) -> None:
+        with self._lock:
+            super().__delitem__(record_id)
+
+    def update_record(self, record_id, changes: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            return super().update_record(record_id, changes)
+
+    def update_many(self, changes_by_id: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """update_record() for each entry under one lock; raises KeyError before changing anything."""
+        with self._lock:
+            missing = [record_id for record_id in changes_by_id if record_id not in self]
+            if missing:
+                raise KeyError(missing[0])
+            return [super(MemoryStore, self).update_record(record_id, changes)
+                    for record_id, changes in changes_by_id.items()]
+
+    def create(self, prefix: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a new record under the next free ID ("<prefix><n>") and return it."""
+        with self._lock:
+            while True:
+                self._counter += 1
+                record_id = f"{prefix}{self._counter}"
+                if record_id not in self:
+                    break
+            record = {'id': record_id, **fields}
+            self[record_id] = record
+            return record
+
+    def create_many(self, prefix: str, fields_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """create() for each entry, holding the lock once for the whole batch."""
+        with self._lock:
+            return [self.create(prefix, fields) for fields in fields_list]
+
+
+class SQLiteStore:
+    """
+    A collection of JSON records in a SQLite table, with the same interface as
+    MemoryStore.
+
+    Indexed fields are copied into their own columns with an index on
+    (field, seq), so filtered pages are index range scans. The database runs
+    in WAL mode, so readers never block the single writer; each thread keeps
+    its own connection and sqlite3's statement cache reuses the prepared
+    statements. IDs come from a counter row updated inside the insert's
+    transaction.
+    """
+
+    def __init__(self, name: str, path: str, records: Optional[Dict[str, Dict[str, Any]]] = None,
+                 indexes: Iterable[str] = ()):
+        self.name = name
+        self.path = path
+        self.indexed_fields = tuple(indexes)
+        self._local = threading.local()
+
+        columns = ''.join(f', "{field}"' for field in self.indexed_fields)
+        placeholders = ', ?' * len(self.indexed_fields)
+        assignments = ''.join(f', "{field}" = ?' for field in self.indexed_fields)
+        self._sql_get = f'SELECT data FROM "{name}" WHERE id = ?'
+        self._sql_seq = f'SELECT seq FROM "{name}" WHERE id = ?'
+        self._sql_insert = f'INSERT INTO "{name}" (id, data{columns}) VALUES (?, ?{placeholders})'
+        self._sql_update = f'UPDATE "{name}" SET data = ?{assignments} WHERE id = ?'
+        self._sql_delete = f'DELETE FROM "{name}" WHERE id = ?'
+        self._sql_count = f'SELECT COUNT(*) FROM "{name}"'
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._create_schema(records or {})
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; writes open their own BEGIN IMMEDIATE transaction
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None,
+                                   check_same_thread=False, cached_statements=256)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self):
+        conn = self._connect()
+        # Take the write lock up front so concurrent writers queue on
+        # busy_timeout instead of failing to upgrade a read lock
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _create_schema(self, seed: Dict[str, Dict[str, Any]]) -> None:
+        columns = ''.join(f', "{field}"' for field in self.indexed_fields)
+        with self._write() as conn:
+            conn.execute(f'CREATE TABLE IF NOT EXISTS "{self.name}" ('
+                         f'seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT NOT NULL UNIQUE, data TEXT NOT NULL{columns})')
+            for field in self.indexed_fields:
+                conn.execute(f'CREATE INDEX IF NOT EXISTS "{self.name}_{field}" ON "{self.name}" ("{field}", seq)')
+            conn.execute('CREATE TABLE IF NOT EXISTS id_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+
+            # Seed a new collection with the sample data
+            if conn.execute('SELECT 1 FROM id_counters WHERE name = ?', (self.name,)).fetchone() is None:
+                for record_id, record in seed.items():
+                    conn.execute(self._sql_insert, self._row(record_id, record))
+                conn.execute('INSERT INTO id_counters (name, value) VALUES (?, ?)', (self.name, len(seed)))
+
+    def _row(self, record_id, record: Dict[str, Any]) -> Tuple:
+        return (record_id, json.dumps(record, ensure_ascii=False),
+                *(record.get(field) for field in self.indexed_fields))
+
+    def __getitem__(self, record_id) -> Dict[str, Any]:
+        row = self._connect().execute(self._sql_get, (record_id,)).fetchone()
+        if row is None:
+            raise KeyError(record_id)
+        return json.loads(row[0])
+
+    def get(self, record_id, default=None):
+        try:
+            return self[record_id]
+        except KeyError:
+            return default
+
+    def __contains__(self, record_id) -> bool:
+        return self._connect().execute(self._sql_seq, (record_id,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self._connect().execute(self._sql_count).fetchone()[0]
+
+    def __setitem__(self, record_id, record) -> None:
+        with self._write() as conn:
+            if conn.execute(self._sql_seq, (record_id,)).fetchone() is None:
+                conn.execute(self._sql_insert, self._row(record_id, record))
+            else:
+                row = self._row(record_id, record)
+                conn.execute(self._sql_update, (*row[1:], record_id))
+
+    def __delitem__(self, record_id) -> None:
+        with self._write() as conn:
+            if conn.execute(self._sql_delete, (record_id,)).rowcount == 0:
+                raise KeyError(record_id)
+
+    def values(self) -> List[Dict[str, Any]]:
+        records, _ = self.find()
+        return records
+
+    def keys(self) -> List[str]:
+        return [record['id'] for record in self.values()]
+
+    def update_record(self, record_id, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply changes to a stored record in one transaction and return the result."""
+        with self._write() as conn:
+            row = conn.execute(self._sql_get, (record_id,)).fetchone()
+            if row is None:
+                raise KeyError(record_id)
+            record = json.loads(row[0])
+            record.update(changes)
+            conn.execute(self._sql_update, (*self._row(record_id, record)[1:], record_id))
+        return record
+
+    def update_many(self, changes_by_id: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """update_record() for each entry in one transaction, written with a single executemany."""
+        with self._write() as conn:
+            records = []
+            for record_id, changes in changes_by_id.items():
+                row = conn.execute(self._sql_get, (record_id,)).fetchone()
+                if row is None:
+                    raise KeyError(record_id)
+                record = json.loads(row[0])
+                record.update(changes)
+                records.append(record)
+            conn.executemany(self._sql_update, [(*self._row(record['id'], record)[1:], record['id'])
+                                                for record in records])
+        return records
+
+    def create(self, prefix: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a new record under the next free ID ("<prefix><n>") and return it."""
+        with self._write() as conn:
+            return self._insert_new(conn, prefix, fields)
+
+    def create_many(self, prefix: str, fields_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """create() for each entry in a single transaction: all are stored or none."""
+        with self._write() as conn:
+            return [self._insert_new(conn, prefix, fields) for fields in fields_list]
+
+    def _insert_new(self, conn, prefix: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        # Caller holds the write transaction
+        while True:
+            conn.execute('UPDATE id_counters SET value = value + 1 WHERE name = ?', (self.name,))
+            counter = conn.execute('SELECT value FROM id_counters WHERE name = ?', (self.name,)).fetchone()[0]
+            record_id = f"{prefix}{counter}"
+            if conn.execute(self._sql_seq, (record_id,)).fetchone() is None:
+                break
+        record = {'id': record_id, **fields}
+        conn.execute(self._sql_insert, self._row(record_id, record))
+        return record
+
+    def find(self, cursor: Optional[str] = None, limit: Optional[int] = None,
+             **filters) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Records matching every filter (field=value), in insertion order.
+        Returns (records, next_cursor); next_cursor is None on the last page.
+        """
+        conn = self._connect()
+        clauses, params = [], []
+        for field, value in filters.items():
+            if field in self.indexed_fields:
+                clauses.append(f'"{field}" = ?')
+            else:
+                clauses.append(f"json_extract(data, '$.' || ?) = ?")
+                params.append(field)
+            params.append(value)
+
+        if cursor is not None:
+            row = conn.execute(self._sql_seq, (cursor,)).fetchone()
+            if row is None:
+                raise KeyError(cursor)
+            clauses.append('seq > ?')
+            params.append(row[0])
+
+        sql = f'SELECT id, data FROM "{self.name}"'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY seq'
+        if limit is not None:
+            # One extra row tells whether another page exists
+            sql += ' LIMIT ?'
+            params.append(limit + 1)
+
+        rows = conn.execute(sql, params).fetchall()
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1][0]
+        return [json.loads(data) for _, data in rows], next_cursor
+
+    def first(self, **filters) -> Optional[Dict[str, Any]]:
+        records, _ = self.find(limit=1, **filters)
+        return records[0] if records else None
+
+
+def iter_records(store, batch_size: int = 500, **filters) -> Iterator[Dict[str, Any]]:
+    """Yield the records matching filters page by page, holding one page at a time."""
+    cursor = None
+    while True:
+        records, cursor = store.find(cursor=cursor, limit=batch_size, **filters)
+        yield from records
+        if cursor is None:
+            return
+
+
+def open_store(name: str, records: Optional[Dict[str, Dict[str, Any]]] = None, indexes: Iterable[str] = (),
+               backend: Optional[str] = None, path: Optional[str] = None):
+    """Open a collection on the configured backend, seeding it with `records` when new."""
+    backend = backend or STORAGE_BACKEND
+    if backend == 'memory':
+        return MemoryStore(name, records, indexes)
+    if backend == 'sqlite':
+        return SQLiteStore(name, path or STORAGE_PATH, records, indexes)
+    raise ValueError(f"Unknown storage backend: {backend}")